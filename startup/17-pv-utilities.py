@@ -0,0 +1,131 @@
+print(f'Loading {__file__}')
+
+################################################################################
+#  Helpers for reading EPICS PVs with as few channel-access round-trips as
+# possible: a monitor-backed cache for PVs read in loops (cacheget), and batch
+# reads of groups of PVs for metadata (pv_snapshot).
+################################################################################
+
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from epics import PV, caget_many
+
+
+class PVCache(object):
+    """
+    Keeps channels open (with monitors) for PVs that are read repeatedly, so
+    that reads are answered locally instead of with a new channel-access get.
+
+    A cached value is used if it was updated (by a monitor event or a direct
+    read) less than max_age seconds ago. Otherwise the PV is read directly,
+    which bounds the staleness even if monitor events are lost. The first read
+    of a PV creates (and connects) its channel.
+    """
+
+    def __init__(self, max_age=10.0, timeout=2.0):
+        self.max_age = max_age
+        self.timeout = timeout
+        self.pvs = {}
+        self.updated = {}  # PV name --> time of last update
+
+    def _on_update(self, pvname=None, **kwargs):
+        self.updated[pvname] = time.time()
+
+    def pv(self, pvname):
+        """Return the (monitored) PV object for this PV name."""
+        if pvname not in self.pvs:
+            self.pvs[pvname] = PV(pvname, auto_monitor=True, callback=self._on_update)
+        return self.pvs[pvname]
+
+    def get(self, pvname, max_age=None, **kwargs):
+        """Return the value of the PV, from the cache if it is fresher than max_age."""
+        pv = self.pv(pvname)
+        if max_age is None:
+            max_age = self.max_age
+        if pv.connected and time.time() - self.updated.get(pvname, -float("inf")) <= max_age:
+            return pv.get(use_monitor=True, **kwargs)
+
+        value = pv.get(use_monitor=False, timeout=self.timeout, **kwargs)
+        if value is not None:
+            self.updated[pvname] = time.time()
+        return value
+
+    def invalidate(self, pvname=None):
+        """Force the next read of the PV (default: all PVs) to go to the IOC."""
+        if pvname is None:
+            self.updated = {}
+        else:
+            self.updated.pop(pvname, None)
+
+
+pv_cache = PVCache()
+
+
+def cacheget(pvname, max_age=None, **kwargs):
+    """Like caget, but answered from pv_cache when the cached value is recent enough."""
+    return pv_cache.get(pvname, max_age=max_age, **kwargs)
+
+
+class PVSnapshot(object):
+    """
+    Reads registered groups of PVs in one concurrent batch, and serves those
+    values until the batch ends. This is used when collecting metadata, where
+    many slowly-varying PVs (temperatures, mono angle, ...) are read together:
+
+        with pv_snapshot.batch():
+            md = sample.get_md()  # calls pv_snapshot.get(...) internally
+
+    Outside of a batch (or for PVs that were not registered), get() reads the
+    PV through pv_cache. Batches can be nested; only the outermost one reads PVs.
+    """
+
+    def __init__(self):
+        self.groups = OrderedDict()  # group name --> list of PV names
+        self.values = {}
+        self.depth = 0
+
+    def register(self, group, pvs):
+        """Add the PVs to a named group (PVs already in the group are kept)."""
+        pv_list = self.groups.setdefault(group, [])
+        for pv in pvs:
+            if pv not in pv_list:
+                pv_list.append(pv)
+
+    def refresh(self, groups=None):
+        """Read all PVs of the given groups (default: all groups) in one batch."""
+        if groups is None:
+            groups = self.groups.keys()
+        pvs = []
+        for group in groups:
+            for pv in self.groups.get(group, []):
+                if pv not in pvs:
+                    pvs.append(pv)
+        if len(pvs) > 0:
+            for pv, value in zip(pvs, caget_many(pvs)):
+                if value is not None:
+                    self.values[pv] = value
+
+    @contextmanager
+    def batch(self, groups=None):
+        """Serve the values of the groups from a single batch read while inside the block."""
+        if self.depth == 0:
+            self.values = {}
+            self.refresh(groups=groups)
+        self.depth += 1
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if self.depth == 0:
+                self.values = {}
+
+    def get(self, pv):
+        """Return the value of the PV, from the current batch if possible."""
+        if self.depth > 0 and pv in self.values:
+            return self.values[pv]
+        return cacheget(pv)
+
+
+pv_snapshot = PVSnapshot()
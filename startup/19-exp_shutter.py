@@ -37,7 +37,7 @@ def shutter_off(verbosity=3):
 
 
 def shutter_state(verbosity=3):
-    if shutter_sts1_pv.get() == 1 and shutter_sts2_pv.get() == 1:
+    if cacheget(shutter_sts1_pv.pvname) == 1 and cacheget(shutter_sts2_pv.pvname) == 1:
         status = 1
         if verbosity >= 3:
             print("Shutter is OPEN.")
@@ -24,6 +24,7 @@ from ophyd.areadetector.filestore_mixins import FileStoreTIFFIterativeWrite
 from ophyd import Component as Cpt, Signal
 from ophyd.utils import set_and_wait
 from nslsii.ad33 import SingleTriggerV33, StatsPluginV33
+from bluesky.utils import Msg, short_uid
 
 from ophyd.areadetector.filestore_mixins import FileStoreHDF5IterativeWrite
 from ophyd.areadetector.plugins import HDF5Plugin #,register_plugin,PluginBase
@@ -475,6 +476,28 @@ class Pilatus2MV33_h5(SingleTriggerV33, PilatusDetector):
             raise error
 
 
+def setExposureTimes(detectors, exposure_time, verbosity=3):
+    """Set the exposure time of several detectors concurrently.
+
+    Each detector's own setExposureTime plan is used (so that detector-specific
+    signals, such as the acquire_period, are also set), but all of the 'set'
+    requests are issued together and then waited on as a single group."""
+
+    group = short_uid("setExposureTimes")
+
+    def concurrent(msg):
+        if msg.command == "set":
+            return msg._replace(kwargs=dict(msg.kwargs, group=group))
+        if msg.command == "wait":
+            return Msg("null")
+        return msg
+
+    for detector in detectors:
+        yield from bpp.msg_mutator(detector.setExposureTime(exposure_time, verbosity=verbosity), concurrent)
+
+    yield from bps.wait(group=group)
+
+
 # print( 'This is the 20-area-dec py.')
 # class StandardProsilicaWithTIFF(StandardProsilica):
 #    tiff = Cpt(TIFFPluginWithFileStore,
@@ -792,6 +815,101 @@ pilatus_Epicsname = "{Det:PIL2M}"
 # pilatus_Epicsname = '{Det:PIL800K}'
 
 
+class DetectorInfo(object):
+    """File-handling details for one area detector.
+
+    The PVs needed for file handling (filename, file path, exposure time) are
+    read lazily and cached until reset() is called, so that they are only read
+    once per exposure.
+    """
+
+    def __init__(self, name, subdir, detname, tile_x=None, tile_x_sign=+1, tile_y=None, pixel_size=0.172):
+        self.name = name
+        self.subdir = subdir  # e.g. '/saxs/raw/'
+        self.detname = detname  # short name used in the linked filenames
+        self.pixel_size = pixel_size  # mm
+        # Detector stage motors used for tiling (to cover the module gaps);
+        # tile_x_sign is the direction of the x move.
+        self.tile_x = tile_x
+        self.tile_x_sign = tile_x_sign
+        self.tile_y = tile_y
+        self.detector = None
+        self.reset()
+
+    def reset(self):
+        """Forget the cached PV values (call at the start of each exposure)."""
+        self._cache = {}
+
+    def _read(self, key, signal):
+        if key not in self._cache:
+            self._cache[key] = signal.get()
+        return self._cache[key]
+
+    @property
+    def full_file_name(self):
+        return self._read("full_file_name", self.detector.tiff.full_file_name)
+
+    @property
+    def file_path(self):
+        return self._read("file_path", self.detector.tiff.file_path)
+
+    @property
+    def file_name(self):
+        return self._read("file_name", self.detector.tiff.file_name)
+
+    @property
+    def acquire_time(self):
+        return self._read("acquire_time", self.detector.cam.acquire_time)
+
+    @property
+    def file_template(self):
+        """Template for the individual frames of a series, e.g. file_template.format(num_frame)"""
+        if "file_template" not in self._cache:
+            prefix = "{:s}/{:s}".format(self.file_path, self.file_name)
+            self._cache["file_template"] = prefix.replace("{", "{{").replace("}", "}}") + "_{:06d}.tiff"
+        return self._cache["file_template"]
+
+
+class DetectorRegistry(object):
+    """Maps detectors (by name) to their output subdirectory and short name."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def register(self, name, subdir, detname, **kwargs):
+        self.entries[name] = DetectorInfo(name, subdir, detname, **kwargs)
+
+    def lookup(self, detector, refresh=False):
+        """Return the DetectorInfo for this detector (None if it is not registered).
+
+        If refresh is True, cached PV values are discarded first."""
+        info = self.entries.get(detector.name)
+        if info is not None:
+            if info.detector is not detector:
+                info.detector = detector
+                info.reset()
+            elif refresh:
+                info.reset()
+        return info
+
+    def reset(self, detectors=None):
+        """Discard cached PV values for the given detectors (default: all)."""
+        if detectors is None:
+            infos = self.entries.values()
+        else:
+            infos = [self.lookup(detector) for detector in detectors]
+        for info in infos:
+            if info is not None:
+                info.reset()
+
+
+detector_registry = DetectorRegistry()
+detector_registry.register("pilatus300", "/maxs/raw/", "maxs", tile_y=MAXSy)
+detector_registry.register("pilatus8002", "/maxs/raw/", "maxs", tile_y=MAXSy)
+detector_registry.register("pilatus2M", "/saxs/raw/", "saxs", tile_x=SAXSx, tile_x_sign=+1, tile_y=SAXSy)
+detector_registry.register("pilatus800", "/waxs/raw/", "waxs", tile_x=WAXSx, tile_x_sign=-1, tile_y=WAXSy)
+
+
 #######################################################
 # These are test functions added by Julien
 # We should remove them once we find the source of the
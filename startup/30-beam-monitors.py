@@ -28,10 +28,10 @@ def curr_to_flux(amp):
 
 def get_bim3(q=0):
     """Returns flux at ion chamber in [ph/s] (q=1 for quiet)"""
-    bim3_v1 = caget("XF:11BMB-BI{IM:3}:IC1_MON")
-    bim3_v2 = caget("XF:11BMB-BI{IM:3}:IC2_MON")
-    bim3_h1 = caget("XF:11BMB-BI{IM:3}:IC3_MON")
-    bim3_h2 = caget("XF:11BMB-BI{IM:3}:IC4_MON")
+    bim3_v1 = cacheget("XF:11BMB-BI{IM:3}:IC1_MON")
+    bim3_v2 = cacheget("XF:11BMB-BI{IM:3}:IC2_MON")
+    bim3_h1 = cacheget("XF:11BMB-BI{IM:3}:IC3_MON")
+    bim3_h2 = cacheget("XF:11BMB-BI{IM:3}:IC4_MON")
     flux_v = curr_to_flux(bim3_v1 + bim3_v2)
     flux_h = curr_to_flux(bim3_h1 + bim3_h2)
     if q == 0:
@@ -53,8 +53,8 @@ def get_bim3(q=0):
 ## Scintillation detector: FMB Oxford C400, channel 1
 def get_bim4(q=0):
     """Returns flux at scintillation detector in [cts/s] (q=1 for quiet)"""
-    bim4_sec = caget("XF:11BMB-BI{IM:4}:GET_PERIOD")
-    bim4_cts = caget("XF:11BMB-BI{IM:4}:C1_1")
+    bim4_sec = cacheget("XF:11BMB-BI{IM:4}:GET_PERIOD")
+    bim4_cts = cacheget("XF:11BMB-BI{IM:4}:C1_1")
 
     ### Ratio between estimated beam flux to raw scintillator counts (see Olog entry on July 7, 2017)
     # For unslitted, unattenuated beam, BIM4 yields 2.86E5 cts/sec for 1.85E11 ph/s at BIM3:
@@ -92,10 +92,10 @@ def get_bim5(q=0):
     bim5_i1_dark = 5.5e-10  # dark current in A
     bim5_i2_dark = 2.3e-10  # dark current in A
     bim5_i3_dark = 5.3e-10  # dark current in A
-    bim5_i0 = caget("XF:11BMB-BI{BPM:1}Cur:I0-I") - bim5_i0_dark  # upper left
-    bim5_i1 = caget("XF:11BMB-BI{BPM:1}Cur:I1-I") - bim5_i1_dark  # upper right
-    bim5_i2 = caget("XF:11BMB-BI{BPM:1}Cur:I2-I") - bim5_i2_dark  # lower left
-    bim5_i3 = caget("XF:11BMB-BI{BPM:1}Cur:I3-I") - bim5_i3_dark  # lower right
+    bim5_i0 = cacheget("XF:11BMB-BI{BPM:1}Cur:I0-I") - bim5_i0_dark  # upper left
+    bim5_i1 = cacheget("XF:11BMB-BI{BPM:1}Cur:I1-I") - bim5_i1_dark  # upper right
+    bim5_i2 = cacheget("XF:11BMB-BI{BPM:1}Cur:I2-I") - bim5_i2_dark  # lower left
+    bim5_i3 = cacheget("XF:11BMB-BI{BPM:1}Cur:I3-I") - bim5_i3_dark  # lower right
 
     ### Ratio between estimated beam flux to raw TOTAL current for the 4 quadrants
     # (see Olog entry on July 7, 2017).
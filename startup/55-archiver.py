@@ -6,6 +6,111 @@ from arvpyf.mgmt import ArchiverConfig
 from arvpyf.cf import PVFinder
 from arvpyf.ar import ArchiverReader
 
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class ArchiverCache(object):
+    """Fetches archived PV data, for several PVs at once, and keeps the results.
+
+    The PVs are requested from the archiver concurrently (up to max_workers at
+    a time). The timestamps are converted to epoch seconds in one vectorized
+    operation. Results are kept in memory and, if cache_dir is set (and
+    pyarrow is available), in one Parquet file per PV and time window, so
+    that repeated requests (e.g. for the same uid) do not go to the archiver
+    again. Windows that end less than min_age seconds ago are not cached,
+    since the archiver may not have all their data yet.
+
+    reader can be any object with a get(pv, since, until) method returning a
+    DataFrame with 'time' and 'data' columns (like arvpyf's ArchiverReader),
+    e.g. a local stand-in for testing.
+    """
+
+    def __init__(self, reader, timezone="US/Eastern", cache_dir=None, max_workers=8, min_age=600):
+        self.reader = reader
+        self.timezone = timezone
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.min_age = min_age
+        self.memory = {}  # (pv, start, end) --> (epoch times, data)
+
+    def _cache_file(self, pv, t_start, t_end):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", pv)
+        return os.path.join(self.cache_dir, "{}_{:d}_{:d}.parquet".format(name, t_start, t_end))
+
+    def to_epoch(self, times):
+        """Convert a Series of datetimes to epoch seconds (naive datetimes are
+        taken to be in the archiver's timezone)."""
+        times = pds.to_datetime(pds.Series(times))
+        if times.dt.tz is None:
+            times = times.dt.tz_localize(self.timezone)
+        return ((times - pds.Timestamp(0, tz="UTC")) / pds.Timedelta(seconds=1)).to_numpy()
+
+    def fetch_one(self, pv, t_start, t_end):
+        """Return (epoch times, data) arrays for one PV between the epoch times
+        t_start and t_end (rounded outwards to whole seconds)."""
+        t_start, t_end = int(np.floor(t_start)), int(np.ceil(t_end))
+        key = (pv, t_start, t_end)
+        if key in self.memory:
+            return self.memory[key]
+
+        cacheable = time.time() - t_end > self.min_age
+        use_disk = cacheable and self.cache_dir is not None and pyarrow is not None
+        if use_disk:
+            filename = self._cache_file(pv, t_start, t_end)
+            if os.path.isfile(filename):
+                df = pds.read_parquet(filename)
+                result = df["time"].to_numpy(), df["data"].to_numpy()
+                self.memory[key] = result
+                return result
+
+        since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t_start))
+        until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t_end))
+        df = self.reader.get(pv, since, until)
+        result = self.to_epoch(df.time), df.data.to_numpy()
+
+        if cacheable:
+            self.memory[key] = result
+        if use_disk:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            pds.DataFrame({"time": result[0], "data": result[1]}).to_parquet(filename)
+        return result
+
+    def fetch(self, pvs, t_start, t_end):
+        """Return {pv: (epoch times, data)} for all the PVs, fetched concurrently."""
+        pvs = list(pvs)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pvs)))) as executor:
+            results = list(executor.map(lambda pv: self.fetch_one(pv, t_start, t_end), pvs))
+        return dict(zip(pvs, results))
+
+    def clear(self, disk=False):
+        """Forget the cached data (and optionally delete the cache files)."""
+        self.memory = {}
+        if disk and self.cache_dir is not None and os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".parquet"):
+                    os.remove(os.path.join(self.cache_dir, filename))
+
+
+def merge_time_windows(windows, gap=0):
+    """Merge overlapping (start, end) time windows, as well as windows that are
+    less than gap seconds apart. Returns the sorted list of merged windows."""
+    merged = []
+    for start, end in sorted(windows):
+        if len(merged) > 0 and start - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(window) for window in merged]
+
+
+ARCHIVER_CACHE_DIR = appdirs.user_cache_dir("cms-archiver")
+
 
 class archiver(Device):
     # setup for CMS archiver
@@ -21,6 +126,7 @@ class archiver(Device):
         self.ar_tz = "US/Eastern"
         self.config = {"url": self.ar_url, "timezone": self.ar_tz}
         self.arvReader = ArchiverReader(self.config)
+        self.cache = ArchiverCache(self.arvReader, timezone=self.ar_tz, cache_dir=ARCHIVER_CACHE_DIR)
 
         self.stage = None
         self.PVs_default = []
@@ -78,21 +184,15 @@ class archiver(Device):
         h1 = db[uid_list[-1]]
         t1 = h1.stop["time"]
 
-        since = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t0 - pre))
-        until = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t1 + post))
+        # fetch all the PVs at once
+        archived = self.cache.fetch([PV_dict[p]["PV"] for p in PV_dict], t0 - pre, t1 + post)
 
         # create pandas for data storage
         PV_df = pds.DataFrame()
 
         for p in list(PV_dict.keys()):
             pv = PV_dict[p]["PV"]
-            df = self.arvReader.get(pv, since, until)
-
-            ep_time = []
-            pv_data = []
-            for i in range(np.shape(df.time)[0]):
-                ep_time.append(datetime.timestamp(df.time[i]))
-                pv_data.append(df.data[i])
+            ep_time, pv_data = archived[pv]
 
             PV_df["a_time"] = ep_time
             PV_df[p] = pv_data
@@ -111,7 +211,7 @@ class archiver(Device):
                 y = pv_data
                 xf, yf = butterworth_filter(x, y, order=3, span=0.005)
 
-                plt.plot(xf, yf, "-", label=lab)
+                plt.plot(xf, yf, "-", label=p)
                 plt.grid(True)
                 plt.ylabel("BPM position / current")
                 plt.xlabel("t$_1$ [s]")  # plt.xlabel('epoch [s]')
@@ -125,6 +225,106 @@ class archiver(Device):
         # PV_df.to_csv(output_name, )
         return PV_df
 
+    def saveArchiverBatch(
+        self,
+        uids=None,
+        query=None,
+        PVs=None,
+        PVs_name=None,
+        pre=0,
+        post=0,
+        gap=600,
+        output_file=None,
+        verbosity=3,
+    ):
+        """Get the archived PVs for many runs at once (e.g. a whole tensile or
+        Linkam series).
+
+        The time windows of the runs are merged (runs less than gap seconds
+        apart share a window), each PV is fetched once per merged window, and
+        the data is then split among the runs.
+
+        Parameters
+        ----------
+        uids : list of str, optional
+            The runs to export.
+        query : dict, optional
+            A databroker query (e.g. {'experiment_alias_directory': ...}), used
+            if uids is not given. One of uids or query is required.
+        pre, post : float
+            Time (in seconds) to include before the start and after the stop of each run.
+        gap : float
+            Runs closer than this (in seconds) are fetched with a single request.
+        output_file : str, optional
+            Save the table as CSV.
+
+        Returns
+        -------
+        DataFrame indexed by uid, with one row per archived value: 'scan_id',
+        'name' (e.g. 'TEMPERATURE'), 'PV', 'epoch', 'time' (relative to the
+        start of the run) and 'data'.
+        """
+
+        if uids is not None:
+            headers = [db[uid] for uid in uids]
+        elif query is not None:
+            headers = list(db(**query))
+        else:
+            print("ERROR: Specify the runs to export (uids or query).")
+            return None
+
+        PV_dict = self.getDict(PVs=PVs, PVs_name=PVs_name, verbosity=verbosity)
+
+        runs = []
+        for h in headers:
+            t_stop = h.stop["time"] if h.stop is not None else h.start["time"]
+            runs.append((h.start["uid"], h.start.get("scan_id"), h.start["time"] - pre, t_stop + post))
+
+        windows = merge_time_windows([(t_start, t_end) for uid, scan_id, t_start, t_end in runs], gap=gap)
+        if verbosity >= 3:
+            print(
+                "Fetching {:d} PVs for {:d} runs in {:d} time windows".format(
+                    len(PV_dict), len(runs), len(windows)
+                )
+            )
+
+        PV_list = [PV_dict[p]["PV"] for p in PV_dict]
+        archived = [self.cache.fetch(PV_list, t_start, t_end) for t_start, t_end in windows]
+        window_starts = np.array([t_start for t_start, t_end in windows])
+
+        tables = []
+        for uid, scan_id, t_start, t_end in runs:
+            data = archived[np.searchsorted(window_starts, t_start, side="right") - 1]
+            for p in PV_dict:
+                pv = PV_dict[p]["PV"]
+                ep_time, pv_data = data[pv]
+                i_start = np.searchsorted(ep_time, t_start, side="left")
+                i_end = np.searchsorted(ep_time, t_end, side="right")
+                tables.append(
+                    pds.DataFrame(
+                        {
+                            "uid": uid,
+                            "scan_id": scan_id,
+                            "name": p,
+                            "PV": pv,
+                            "epoch": ep_time[i_start:i_end],
+                            "time": ep_time[i_start:i_end] - (t_start + pre),
+                            "data": pv_data[i_start:i_end],
+                        }
+                    )
+                )
+
+        columns = ["uid", "scan_id", "name", "PV", "epoch", "time", "data"]
+        PV_df = pds.concat(tables, ignore_index=True) if len(tables) > 0 else pds.DataFrame(columns=columns)
+        PV_df = PV_df.set_index("uid")
+
+        if output_file is not None:
+            PV_df.to_csv(output_file)
+            if verbosity >= 3:
+                print("Saved archived data to {}".format(output_file))
+
+        return PV_df
+
 
 # CHX example
 
@@ -140,6 +340,7 @@ ar_url = "http://epics-services-cms.nsls2.bnl.local:11168"
 ar_tz = 'US/Eastern'
 config = {'url': ar_url, 'timezone': ar_tz}
 arvReader = ArchiverReader(config)
+archiver_cache = ArchiverCache(arvReader, timezone=ar_tz, cache_dir=ARCHIVER_CACHE_DIR)
 # arvReader = ArchiverReader({"url": "http://epics-services-cms.nsls2.bnl.local:11168", "timezone": "US/Eastern"})
 #
 
@@ -187,13 +388,9 @@ def get_archived_pvs_from_uid(pv_list,uid,pre=0,post=0,verbose=True):
     post: time [s] to get data past time in stop document for uid
    
     returns: dictionary: {'pv1':{'time':np.array(time [s]),'data':np.array(pv data from archiver)}}
+
+    The PVs are fetched concurrently, and cached (see archiver_cache).
     """
-    # datetime has changed from datetime.datetime.timestamp to datetime.timestamp... make sure it works with current and legocy environments
-    try:
-        datetime.timestamp(datetime.now())
-        current=True
-    except:
-        current=False
     h=db[uid]
     t0=h.start['time'];tmax=h.stop['time']
     since=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t0-pre))
@@ -201,18 +398,7 @@ def get_archived_pvs_from_uid(pv_list,uid,pre=0,post=0,verbose=True):
     if verbose:
         print('getting archived data for PVs %s\nuid: %s\ntime: start of uid - %ss to end of uid +%ss\n%s - %s'%(pv_list,uid,pre,post,since,until))
     pv_dict = {}
-    for p in pv_list:
-        df = arvReader.get(p, since, until)
-        ep_time=[]
-        pv_data=[]
-        for i in range(np.shape(df.time)[0]):
-            if current:
-                ep_time.append(datetime.timestamp(df.time[i]))
-            else:
-                p_time.append(datetime.datetime.timestamp(df.time[i]))
-            pv_data.append(df.data[i])
-        time_zero=ep_time[0]
-        ep_time=np.array(ep_time);pv_data=np.array(pv_data)
+    for p, (ep_time, pv_data) in archiver_cache.fetch(pv_list, t0-pre, tmax+post).items():
         #x=ep_time-t0;y=pv_data
         pv_dict[p]={'time':ep_time-t0,'data':pv_data}
     return pv_dict
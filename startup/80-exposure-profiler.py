@@ -0,0 +1,149 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# vi: ts=4 sw=4
+print(f'Loading {__file__}')
+
+################################################################################
+#  Timing instrumentation for the acquisition path (shutter, exposure, file
+# handling). Used to find dead time between exposures.
+################################################################################
+# Known Bugs:
+#  N/A
+################################################################################
+# TODO:
+#  Search for "TODO" below.
+################################################################################
+
+import time
+import functools
+import contextlib
+from collections import deque, OrderedDict
+
+import numpy as np
+import pandas as pds
+
+
+class ExposureProfiler(object):
+    """Collects the duration of named spans of the acquisition path.
+
+    Durations are kept in rolling windows (the last ``window`` values), grouped
+    by the combination of detectors that was active when the span was recorded,
+    so that e.g. SAXS-only and SAXS+WAXS measurements can be compared.
+
+    Spans are recorded either with the context manager:
+        with exposure_profiler.span('beam.on'):
+            ...
+    or by decorating a function/method:
+        @exposure_profiler.timed('handle_file')
+        def handle_file(...):
+            ...
+
+    At the end of a run, the statistics can be inspected with:
+        exposure_profiler.print_summary()
+        exposure_profiler.to_csv('/path/to/profile.csv')
+    """
+
+    def __init__(self, window=500, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.durations = OrderedDict()  # (detectors, span) --> deque of durations
+
+    def current_key(self):
+        """Return a label for the currently active combination of detectors."""
+        try:
+            detectors = get_beamline().detector
+        except Exception:
+            return "none"
+        names = sorted(detector.name for detector in detectors)
+        return "+".join(names) if len(names) > 0 else "none"
+
+    def record(self, name, duration, key=None):
+        """Add a single duration (in seconds) for the span 'name'."""
+        if not self.enabled:
+            return
+        if key is None:
+            key = self.current_key()
+        if (key, name) not in self.durations:
+            self.durations[(key, name)] = deque(maxlen=self.window)
+        self.durations[(key, name)].append(duration)
+
+    @contextlib.contextmanager
+    def span(self, name, key=None):
+        """Context manager that records the time spent inside the block."""
+        if not self.enabled:
+            yield
+            return
+        if key is None:
+            key = self.current_key()
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start_time, key=key)
+
+    def timed(self, name):
+        """Decorator that records every call of the function as span 'name'."""
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self):
+        """Forget all recorded durations."""
+        self.durations = OrderedDict()
+
+    def histogram(self, name, key=None, bins=10):
+        """Return (counts, bin_edges) for the durations of span 'name'.
+
+        If key is None, the current detector combination is used."""
+        if key is None:
+            key = self.current_key()
+        values = np.asarray(self.durations.get((key, name), []))
+        if len(values) < 1:
+            return np.zeros(bins, dtype=int), np.zeros(bins + 1)
+        return np.histogram(values, bins=bins)
+
+    def summary(self):
+        """Return a DataFrame with one row per (detectors, span)."""
+        rows = []
+        for (key, name), values in self.durations.items():
+            values = np.asarray(values)
+            rows.append(
+                {
+                    "detectors": key,
+                    "span": name,
+                    "count": len(values),
+                    "total": np.sum(values),
+                    "mean": np.mean(values),
+                    "median": np.median(values),
+                    "p90": np.percentile(values, 90),
+                    "max": np.max(values),
+                }
+            )
+        columns = ["detectors", "span", "count", "total", "mean", "median", "p90", "max"]
+        return pds.DataFrame(rows, columns=columns)
+
+    def print_summary(self, verbosity=3):
+        df = self.summary()
+        if verbosity >= 1:
+            if len(df) < 1:
+                print("No exposure timing recorded.")
+            else:
+                print(df.to_string(index=False, float_format="{:.3f}".format))
+        return df
+
+    def to_csv(self, filename, verbosity=3):
+        df = self.summary()
+        df.to_csv(filename, index=False)
+        if verbosity >= 3:
+            print("Saved exposure timing summary to {}".format(filename))
+        return df
+
+
+exposure_profiler = ExposureProfiler()
@@ -308,7 +308,7 @@ class Shutter(BeamlineElement):
         undefined - Element is in an unexpected state.
         """
 
-        state_n = caget(self._pv_main + "Pos-Sts")
+        state_n = cacheget(self._pv_main + "Pos-Sts")
 
         if state_n == 0:
             return "out"
@@ -348,7 +348,7 @@ class GateValve(Shutter):
         undefined - Element is in an unexpected state.
         """
 
-        state_n = caget(self._pv_main + "Pos-Sts")
+        state_n = cacheget(self._pv_main + "Pos-Sts")
 
         if state_n == 1:
             return "out"
@@ -437,7 +437,7 @@ class DiagnosticScreen(Monitor):
         undefined - Element is in an unexpected state.
         """
 
-        state_n = caget(self._pv_main + "Pos-Sts")
+        state_n = cacheget(self._pv_main + "Pos-Sts")
 
         if state_n == 0:
             return "out"
@@ -899,6 +899,7 @@ class CMSBeam(object):
 
     def __init__(self):
         self.mono_bragg_pv = "XF:11BMA-OP{Mono:DMM-Ax:Bragg}Mtr.RBV"
+        pv_snapshot.register("beam", [self.mono_bragg_pv])
 
         # (planck constant * speed of light)/(electronic charge)
         self.hc_over_e = 1.23984197e-6  # m^3 kg s^-3 Amp^-1 = eV*m
@@ -1062,7 +1063,7 @@ class CMSBeam(object):
         """
 
         # Current angle of monochromator multilayer crystal
-        Bragg_deg = caget(self.mono_bragg_pv)
+        Bragg_deg = pv_snapshot.get(self.mono_bragg_pv)
         Bragg_rad = np.radians(Bragg_deg)
 
         wavelength_A = 2.0 * self.dmm_dsp * np.sin(Bragg_rad)
@@ -1089,7 +1090,7 @@ class CMSBeam(object):
         """
 
         # Current angle of monochromator multilayer crystal
-        Bragg_deg = caget(self.mono_bragg_pv)
+        Bragg_deg = pv_snapshot.get(self.mono_bragg_pv)
         Bragg_rad = np.radians(Bragg_deg)
 
         wavelength_A = 2.0 * self.dmm_dsp * np.sin(Bragg_rad)
@@ -1413,6 +1414,7 @@ class CMSBeam(object):
             shutter_state(verbosity=verbosity)
         return shutter_state(verbosity=0)
 
+    @exposure_profiler.timed("beam.on")
     def on(
         self,
         verbosity=3,
@@ -1437,6 +1439,7 @@ class CMSBeam(object):
                 else:
                     print("Beam off (shutter didn't open).")
 
+    @exposure_profiler.timed("beam.off")
     def off(
         self,
         verbosity=3,
@@ -1465,7 +1468,7 @@ class CMSBeam(object):
     def blade1_is_on(self, verbosity=3):
         """Returns true if the beam is on (experimental shutter open)."""
 
-        blade1 = caget("XF:11BMB-OP{PSh:2}Pos:1-Sts")
+        blade1 = cacheget("XF:11BMB-OP{PSh:2}Pos:1-Sts")
 
         if blade1 == 1:
             if verbosity >= 4:
@@ -1482,7 +1485,7 @@ class CMSBeam(object):
     def blade2_is_on(self, verbosity=3):
         """Returns true if the beam is on (experimental shutter open)."""
 
-        blade2 = caget("XF:11BMB-OP{PSh:2}Pos:2-Sts")
+        blade2 = cacheget("XF:11BMB-OP{PSh:2}Pos:2-Sts")
 
         if blade2 == 1:
             if verbosity >= 4:
@@ -1512,7 +1515,7 @@ class CMSBeam(object):
 
         else:
             # The states of the foils in the filter box
-            N = [caget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil)) for ifoil in range(1, 8 + 1)]
+            N = self.get_attenuation_filters(verbosity=0)
             # N = [fil.sts.get() for fil in self.atten_filter.values()]
             tr_tot = self.calc_transmission_filters(N, verbosity=verbosity)
 
@@ -1579,23 +1582,30 @@ class CMSBeam(object):
 
             return tr_tot
 
-    def set_attenuation_filters(self, filter_settings, verbosity=3):
+    def set_attenuation_filters(self, filter_settings, current=None, timeout=5.0, poling_period=0.05, verbosity=3):
         """
         Sets the positions (in/out) for each of the foils in the attenuator/
         filter box. The input 'filter_settings' should be an array of length
         8, where each element is either a zero (foil removed) or a 1 (foil
         blocking beam).
+
+        Only the foils that need to change are actuated (all at once), and the
+        function returns as soon as their position readbacks report the new
+        states (or after 'timeout' seconds). The current states can be passed
+        as 'current' if they are already known; otherwise they are read.
         """
 
+        if len(filter_settings) != 8:
+            print("States for all eight foils must be specified.")
+            return
+
+        if current is None:
+            current = self.get_attenuation_filters(verbosity=0)
+
         if verbosity >= 4:
             print("Filters:")
-            # The states of the foils in the filter box
-            filters_initial = [caget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil)) for ifoil in range(1, 8 + 1)]
             print(
-                "  initial:    {} T = {:.6g}".format(
-                    filters_initial,
-                    self.calc_transmission_filters(filters_initial, verbosity=0),
-                )
+                "  initial:    {} T = {:.6g}".format(current, self.calc_transmission_filters(current, verbosity=0))
             )
             print(
                 "  requested:  {} T = {:.6g}".format(
@@ -1604,35 +1614,53 @@ class CMSBeam(object):
                 )
             )
 
-        if len(filter_settings) != 8:
-            print("States for all eight foils must be specified.")
+        to_move = {}
+        for i, state in enumerate(filter_settings):
+            ifoil = i + 1
 
-        else:
-            for i, state in enumerate(filter_settings):
-                ifoil = i + 1
+            if state == 1 or state == 0:
+                if state != current[i]:
+                    to_move[ifoil] = state
 
-                if state == 1:
-                    # Put foil #ifoil into the beam
-                    caput("XF:11BMB-OP{{Fltr:{:d}}}Cmd:In-Cmd".format(ifoil), 1)
+            else:
+                if verbosity >= 3:
+                    state_actual_str = "IN" if current[i] == 1 else "OUT"
+                    print(
+                        "WARNING: Filter state {} not recognized. Filter {:d} is {:s}.".format(
+                            state, ifoil, state_actual_str
+                        )
+                    )
 
-                elif state == 0:
-                    # Remove foil #ifoil
-                    caput("XF:11BMB-OP{{Fltr:{:d}}}Cmd:Out-Cmd".format(ifoil), 1)
+        # Issue all the commands first (caput does not wait for completion)
+        for ifoil, state in to_move.items():
+            if state == 1:
+                # Put foil #ifoil into the beam
+                caput("XF:11BMB-OP{{Fltr:{:d}}}Cmd:In-Cmd".format(ifoil), 1)
+            else:
+                # Remove foil #ifoil
+                caput("XF:11BMB-OP{{Fltr:{:d}}}Cmd:Out-Cmd".format(ifoil), 1)
 
-                else:
-                    if verbosity >= 3:
-                        state_actual = caget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil))
-                        state_actual_str = "IN" if state_actual == 1 else "OUT"
+        # Wait for the filter box to report the new positions
+        start_time = time.time()
+        while len(to_move) > 0:
+            to_move = {
+                ifoil: state
+                for ifoil, state in to_move.items()
+                if cacheget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil)) != state
+            }
+            if len(to_move) > 0:
+                if time.time() - start_time > timeout:
+                    if verbosity >= 1:
                         print(
-                            "WARNING: Filter state {} not recognized. Filter {:d} is {:s}.".format(
-                                state, ifoil, state_actual_str
+                            "WARNING: Filters {} did not reach the requested state within {:.1f} s.".format(
+                                list(to_move.keys()), timeout
                             )
                         )
-
-            time.sleep(1.0)  # Wait for filter box to settle
+                    break
+                time.sleep(poling_period)
 
         if verbosity >= 4:
-            filters_final = [caget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil)) for ifoil in range(1, 8 + 1)]
+            filters_final = self.get_attenuation_filters(verbosity=0)
             print(
                 "  final:      {} T = {:.6g}".format(
                     filters_final,
@@ -1640,6 +1668,83 @@ class CMSBeam(object):
                 )
             )
 
+    def get_attenuation_filters(self, verbosity=3):
+        """Returns the current states (0 = out, 1 = in) of the eight foils in the filter box."""
+        N = [cacheget("XF:11BMB-OP{{Fltr:{:d}}}Pos-Sts".format(ifoil)) for ifoil in range(1, 8 + 1)]
+        if verbosity >= 4:
+            print("  filters:    {}".format(N))
+        return N
+
+    def transmission_table(self, energy_keV=None):
+        """
+        Returns the states of the filter box and their transmission values, at
+        the given energy (default is the current energy). The table covers all
+        256 combinations of the eight foils, and is cached for each energy.
+
+        Returns
+        -------
+        states : (256, 8) array
+            Row k gives the foil states (0 or 1) for the k-th combination.
+        transmissions : (256,) array
+            Computed transmission for each row of states.
+        """
+
+        if energy_keV is None:
+            energy_keV = self.energy(verbosity=0)
+
+        if not hasattr(self, "_transmission_tables"):
+            self._transmission_tables = {}
+        key = round(energy_keV, 4)
+        if key not in self._transmission_tables:
+            states = (np.arange(256)[:, np.newaxis] >> np.arange(8)) & 1
+            transmissions = self.calc_transmission_filters(list(states.T), energy_keV=energy_keV, verbosity=0)
+            self._transmission_tables[key] = (states, transmissions)
+
+        return self._transmission_tables[key]
+
+    def transmission_options(self, transmission, num=5, current=None, energy_keV=None, verbosity=3):
+        """
+        Returns the foil combinations that best match the requested transmission.
+        Note that the foils are not actually moved.
+
+        The num closest combinations (smallest deviation from the requested
+        transmission) are selected and are then ranked by the number of foils
+        that would have to move from the current state (ties are broken by the
+        deviation). The first entry is always the closest combination.
+
+        Parameters
+        ----------
+        transmission : float
+            The requested transmission.
+        num : int
+            Number of alternatives to return.
+        current : array of length 8
+            Current foil states. If 'None', the filter box is queried.
+        energy_keV : float
+            If 'None', the current energy is used.
+
+        Returns
+        -------
+        options : list of (states, transmission, moves)
+        """
+
+        states, transmissions = self.transmission_table(energy_keV=energy_keV)
+        if current is None:
+            current = self.get_attenuation_filters(verbosity=0)
+        moves = np.sum(states != np.asarray(current), axis=1)
+
+        # Closest match first (fewest moves for equal deviation), then the alternatives
+        deviation = np.abs(transmissions - transmission)
+        order = np.lexsort((moves, deviation))[:num]
+        order = np.concatenate((order[:1], sorted(order[1:], key=lambda k: (moves[k], deviation[k]))))
+
+        options = [([int(state) for state in states[k]], float(transmissions[k]), int(moves[k])) for k in order]
+        if verbosity >= 4:
+            for N, tr, nmoves in options:
+                print("  {} T = {:.6g} ({:d} moves)".format(N, tr, nmoves))
+
+        return options
+
     def setTransmission(self, transmission, retries=3, tolerance=0.7, verbosity=3):
         """
         Sets the transmission through the attenuator/filter box.
@@ -1660,66 +1765,23 @@ class CMSBeam(object):
             print("A transmission this low ({:g}) cannot be reliably achieved.".format(transmission))
 
         else:
-            E = energy_keV
-            E2 = np.square(E)
-            E3 = np.power(E, 3)
+            current = self.get_attenuation_filters(verbosity=0)
+            N = self.transmission_options(transmission, num=1, current=current, energy_keV=energy_keV)[0][0]
+            self.set_attenuation_filters(N, current=current, verbosity=verbosity)
 
-            d_Nb = 0.1  # Thickness [mm] of one Nb foil
-            d_Al = 0.25  # Thickness [mm] of one Al foil
-
-            # Absorption length [mm] based on fits to LBL CXRO data for 6 < E < 19 keV
-            l_Nb = 1.4476e-3 - 5.6011e-4 * E + 1.0401e-4 * E2 + 8.7961e-6 * E3
-            l_Al = 5.2293e-3 - 1.3491e-3 * E + 1.7833e-4 * E2 + 1.4001e-4 * E3
-
-            d_l_Nb = d_Nb / l_Nb
-            d_l_Al = d_Al / l_Al
-
-            # Number of foils to be inserted (equivalent to "XIA_attn.mac" from X9)
-            # N_Nb = int(-log(transmission)/d_l_Nb)
-            ##N_Al = int((-log(transmission) - N_Nb*d_l_Nb)/(d_l_Al-0.5))
-            # N_Al = int((-log(transmission) - N_Nb*d_l_Nb)/d_l_Al)
-
-            # Number of foils to be inserted (picks a set that gives smallest deviation from requested transmission)
-            dev = []
-            for i in np.arange(16):
-                for j in np.arange(16):
-                    dev_ij = abs(transmission - exp(-i * d_l_Nb) * exp(-j * d_l_Al))
-                    dev.append(dev_ij)
-                    if dev_ij == min(dev):
-                        N_Nb = i  # number of Nb foils selected
-                        N_Al = j  # number of Al foils selected
-
-            N = []
-            state = N_Al
-            for i in np.arange(4):
-                N.append(state % 2)
-                state = int(state / 2)
-
-            state = N_Nb
-            for i in np.arange(4):
-                N.append(state % 2)
-                state = int(state / 2)
-
-            self.set_attenuation_filters(N, verbosity=verbosity)
-
-        # Check that transmission was actually correctly changed
-        if abs(self.transmission(verbosity=0) - transmission) / transmission > tolerance:
-            if retries > 0:
-                # time.sleep(0.5)
-                # Try again
-                return self.setTransmission(
-                    transmission,
-                    retries=retries - 1,
-                    tolerance=tolerance,
-                    verbosity=verbosity,
-                )
+            # Check that transmission was actually correctly changed
+            for retry in range(retries):
+                if abs(self.transmission(verbosity=0) - transmission) / transmission <= tolerance:
+                    break
+                self.set_attenuation_filters(N, verbosity=verbosity)
 
             else:
-                print(
-                    "WARNING: transmission didn't update correctly (request: {}; actual: {})".format(
-                        transmission, self.transmission(verbosity=0)
+                if abs(self.transmission(verbosity=0) - transmission) / transmission > tolerance:
+                    print(
+                        "WARNING: transmission didn't update correctly (request: {}; actual: {})".format(
+                            transmission, self.transmission(verbosity=0)
+                        )
                     )
-                )
 
         return self.transmission(verbosity=verbosity)
 
@@ -2987,8 +3049,9 @@ class CMS_Beamline(Beamline):
 
     def get_md(self, prefix=None, **md):
         md_current = self.md.copy()
-        md_current["calibration_energy_keV"] = float(round(self.beam.energy(verbosity=0), 3))
-        md_current["calibration_wavelength_A"] = float(round(self.beam.wavelength(verbosity=0), 5))
+        with pv_snapshot.batch():
+            md_current["calibration_energy_keV"] = float(round(self.beam.energy(verbosity=0), 3))
+            md_current["calibration_wavelength_A"] = float(round(self.beam.wavelength(verbosity=0), 5))
 
         h, v = self.beam.size(verbosity=0)
         md_current["beam_size_x_mm"] = h
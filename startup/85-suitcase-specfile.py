@@ -6,6 +6,7 @@ import event_model
 # from datetime import datetime # HZ
 import datetime
 import os
+import time
 from pathlib import Path
 import jinja2
 import suitcase.utils
@@ -432,42 +433,141 @@ def to_spec_scan_header(start, primary_descriptor, baseline_event=None):
 _SPEC_EVENT_TEMPLATE = env.from_string("""
 {{ motor_positions | join(' ') }}  {{ unix_time }} {{ acq_time }} {{ values | join(' ') }}""")
 
+def _format_spec_line(motor_positions, unix_time, acq_time, values):
+    # Same output as _SPEC_EVENT_TEMPLATE, without going through jinja for every event
+    return '\n{}  {} {} {}'.format(' '.join([str(v) for v in motor_positions]), unix_time, acq_time,
+                                   ' '.join([str(v) for v in values]))
+
+
+def _lscan_pseudo_columns(start):
+    """Return a function computing the additional (normalization) columns of
+    lscan_pseudo from the data of an event."""
+    energy = start.get('energy')
+    wvlength = 12.39842 / (0.001 * energy)  #in A
+    k = 2*np.pi/wvlength
+
+    def columns(data):
+        # quadem3_expo_integrated = event['data']['quadem_current3_mean_value']*event['data']['exposure_time']
+        quadem3_expo_integrated = data['monitor_3']*data['expo_time']
+        quadem3_expo_integrated_attenuated = quadem3_expo_integrated / data['attenuation']
+        qz = abs(k*(np.sin(np.deg2rad(data['geo_alpha'])) + np.sin(np.deg2rad(data['geo_beta']))))
+        # lambda_det_stats2_sub_stats13 = event['data']['lambda_det_stats2_total'] - 0.5*(event['data']['lambda_det_stats1_total'] + event['data']['lambda_det_stats3_total'])
+        lambda_det_stats2_sub_stats13 = data['lambda_2'] - 0.5*(data['lambda_1'] + data['lambda_3'])
+        lambda_det_stats2_sub_stats13_qz4 = lambda_det_stats2_sub_stats13 * qz**4
+        return [qz, lambda_det_stats2_sub_stats13, lambda_det_stats2_sub_stats13_qz4,
+                quadem3_expo_integrated_attenuated] # the last one is monitor x exposure_time / attenuation
+
+    return columns
+
+
+def compile_spec_scan_data(start, primary_descriptor):
+    """Work out once (per descriptor) which values make up a data line of the
+    primary stream, and return a function that formats an event as such a line.
+
+    The motor columns are listed as (key, from_data) pairs, where from_data is
+    False for the sequence number; then come the data keys (missing values are
+    written as None), and for lscan_pseudo the computed normalization columns.
+    """
+    acq_time = _get_acq_time(start)
+    plan_name = _get_plan_name(start)
+    has_motors = plan_name in _SPEC_SCAN_NAMES and plan_name not in _SCANS_WITHOUT_MOTORS
+    motor_columns = [(motor_name, has_motors and motor_name != 'seq_num')
+                     for motor_name in _get_motor_names(start)]
+    data_keys = _get_scan_data_column_names(start, primary_descriptor)
+    extra_columns = _lscan_pseudo_columns(start) if plan_name in ['lscan_pseudo'] else None
+
+    def format_event(event):
+        data = event['data']
+        seq_num = event['seq_num']
+        values = [data.get(k, None) for k in data_keys]
+        if extra_columns is not None:
+            values += extra_columns(data)
+        return _format_spec_line(
+            [data[key] if from_data else seq_num for key, from_data in motor_columns],
+            int(event['time']), acq_time, values)
+
+    return format_event
+
+
 def to_spec_scan_data(start, primary_descriptor, event):
+    """Format an event of the primary stream as a spec data line.
+
+    When formatting many events, use compile_spec_scan_data instead."""
+    return compile_spec_scan_data(start, primary_descriptor)(event)
+
+
+_SPEC_STREAM_HEADER_TEMPLATE = env.from_string("""
+#C Stream: {{ stream_name }}
+#N {{ num_columns }}
+#L {{ motor_names | join('  ') }}  Epoch  Seconds  {{ data_keys | join('  ') }}
+""")
+
+
+def _get_stream_motor_names(start, descriptor):
+    """The scanning motors that are recorded in this (non-primary) stream,
+    or ['seq_num'] if there are none."""
+    motor_names = [m for m in _get_motor_names(start) if m in descriptor['data_keys']]
+    return motor_names if len(motor_names) > 0 else ['seq_num']
+
+
+def _get_stream_column_names(start, descriptor):
+    motor_names = _get_stream_motor_names(start, descriptor)
+    return sorted(
+        [k for k, v in descriptor['data_keys'].items()
+         if (k not in motor_names and not v['shape'] and '_setpoint' not in k)])
+
+
+def to_spec_stream_header(start, descriptor, primary=False):
+    """Generate the #L block that starts (or resumes) the data of an event
+    stream within the current scan.
+
+    Parameters
+    ----------
+    start : Document or dict
+        The RunStart document emitted by the bluesky RunEngine
+    descriptor : Document or dict
+        The Descriptor of the event stream
+    primary : bool, optional
+        Whether this is the primary stream, whose columns are the ones of the
+        scan header (see to_spec_scan_header and to_spec_scan_data).
+
+    Returns
+    -------
+    str
+        The formatted column header for the stream.
+    """
     md = {}
-    md['unix_time'] = int(event['time'])
-    md['acq_time'] = _get_acq_time(start)
-    # md['motor_position'] = _get_motor_position(start, event) # HZ
-    motor_names = _get_motor_names(start) # HZ
-    md['motor_positions'] = [_get_one_motor_position(start, event, motor_name) for motor_name in motor_names]
-    data_keys = _get_scan_data_column_names(start, primary_descriptor)
-    # md['values'] = [event['data'][k] for k in data_keys] # HZ
+    md['stream_name'] = descriptor.get('name', descriptor['uid'])
+    if primary:
+        md['motor_names'] = _get_motor_names(start)
+        md['data_keys'] = _get_scan_data_column_names(start, descriptor)
+        if _get_plan_name(start) in ['lscan_pseudo']:
+            md['data_keys'] += ['qz', 'ref_bkgsub', 'ref_bkgsub_qz4', 'mon_3_atten']
+    else:
+        md['motor_names'] = _get_stream_motor_names(start, descriptor)
+        md['data_keys'] = _get_stream_column_names(start, descriptor)
+    md['num_columns'] = 2 + len(md['motor_names']) + len(md['data_keys'])
+    return _SPEC_STREAM_HEADER_TEMPLATE.render(md)
 
-    # for additional columns, HZ testing
-    md['values'] = [event['data'].get(k, None) for k in data_keys]
 
-    if _get_plan_name(start) in ['lscan_pseudo']: ## addtional col for normalization
+def compile_spec_stream_data(start, descriptor):
+    """Like compile_spec_scan_data, for an additional event stream (see to_spec_stream_header)."""
+    acq_time = _get_acq_time(start)
+    motor_names = _get_stream_motor_names(start, descriptor)
+    data_keys = _get_stream_column_names(start, descriptor)
 
-        # quadem3_expo_integrated = event['data']['quadem_current3_mean_value']*event['data']['exposure_time']
-        # quadem3_expo_integrated = event['data']['mon_3']*event['data']['exposure_time']
-        quadem3_expo_integrated = event['data']['monitor_3']*event['data']['expo_time']
-        quadem3_expo_integrated_attenuated = quadem3_expo_integrated / event['data']['attenuation']
-        # md['values'].append(quadem3_expo_integrated) # monitor x exposure_time
-        
-        energy = start.get('energy')
-        wvlength = 12.39842 / (0.001 * energy)  #in A
-        qz = abs(2*np.pi/wvlength*(np.sin(np.deg2rad(event['data']['geo_alpha'])) + np.sin(np.deg2rad(event['data']['geo_beta']))))
+    def format_event(event):
+        data = event['data']
+        return _format_spec_line(
+            [event['seq_num'] if motor_name == 'seq_num' else data[motor_name] for motor_name in motor_names],
+            int(event['time']), acq_time, [data.get(k, None) for k in data_keys])
 
-        # lambda_det_stats2_sub_stats13 = event['data']['lambda_det_stats2_total'] - 0.5*(event['data']['lambda_det_stats1_total'] + event['data']['lambda_det_stats3_total'])
-        lambda_det_stats2_sub_stats13 = event['data']['lambda_2'] - 0.5*(event['data']['lambda_1'] + event['data']['lambda_3'])
-        # lambda_det_stats2_sub_stats13_alpha4 = lambda_det_stats2_sub_stats13 * event['data']['geo_alpha']**4
+    return format_event
 
-        lambda_det_stats2_sub_stats13_qz4 = lambda_det_stats2_sub_stats13 * qz**4
-        md['values'].append(qz) 
-        md['values'].append(lambda_det_stats2_sub_stats13) 
-        md['values'].append(lambda_det_stats2_sub_stats13_qz4)
-        md['values'].append(quadem3_expo_integrated_attenuated) # monitor x exposure_time
 
-    return _SPEC_EVENT_TEMPLATE.render(md)
+def to_spec_stream_data(start, descriptor, event):
+    """Format an event of an additional event stream (see to_spec_stream_header)."""
+    return compile_spec_stream_data(start, descriptor)(event)
 
 
 # Dictionary that maps a spec metadata line to a specific lambda function
@@ -594,6 +694,15 @@ class Serializer(event_model.DocumentRouter):
         the full document stream is slower but each document is immediately
         available for reading. False by default.
 
+    flush_interval : float, optional
+        Buffer the output, and only write it to the file (and flush) once the
+        oldest buffered line is this many seconds old. The buffer is always
+        written at the end of the run (stop) and on close.
+
+    flush_size : int, optional
+        Buffer the output, and write it to the file (and flush) once this many
+        characters are buffered. Can be combined with flush_interval.
+
     Attributes
     ----------
     artifacts
@@ -604,14 +713,23 @@ class Serializer(event_model.DocumentRouter):
     -----
     1. `Reference <https://github.com/certified-spec/specPy/blob/master/doc/specformat.rst>`_
         for the spec file format.
-    2. If there is more than one primary descriptor, the behavior of this spec
-       callback is undefined.  Please do not use this callback with more than
-       one descriptor.
+    2. The first descriptor (other than 'precount', which is used as the
+       baseline) is the primary stream, whose columns are given in the scan
+       header. Events of any other stream are written after a new '#L' line
+       listing the columns of that stream; a new '#L' line is written
+       whenever the stream changes from one event to the next.
     """
-    def __init__(self, directory, file_prefix='{start[uid]}', flush=False):
+    def __init__(self, directory, file_prefix='{start[uid]}', flush=False,
+                 flush_interval=None, flush_size=None):
 
         self._file_prefix = file_prefix
         self._flush = flush
+        self._flush_interval = flush_interval
+        self._flush_size = flush_size
+        self._buffered = flush_interval is not None or flush_size is not None
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffer_time = None  # when the oldest buffered line was added
         self._templated_file_prefix = ''  # set when we get a 'start' document
 
         if isinstance(directory, (str, Path)):
@@ -631,6 +749,9 @@ class Serializer(event_model.DocumentRouter):
         self._baseline_descriptor = None
         self._baseline_event = None
         self._primary_descriptor = None
+        self._descriptors = {}  # uid --> descriptor, for all streams written out
+        self._line_formatters = {}  # uid --> function formatting an event of that stream
+        self._current_stream = None  # uid of the descriptor of the last line written
         self._has_not_written_scan_header = True
         self._has_not_written_file_header = True
         self._num_events_received = 0
@@ -653,8 +774,36 @@ class Serializer(event_model.DocumentRouter):
         """
         Close all of the resources (e.g. files) allocated.
         """
+        self._write_buffer()
         self._manager.close()
 
+    def _write(self, text):
+        """Write to the file, or to the buffer in buffered mode (in which case
+        the buffer is written once the time or size budget is exceeded)."""
+        if not self._buffered:
+            self._file.write(text)
+            if self._flush:
+                self._file.flush()
+            return
+
+        if self._buffer_time is None:
+            self._buffer_time = time.monotonic()
+        self._buffer.append(text)
+        self._buffer_size += len(text)
+        if ((self._flush_size is not None and self._buffer_size >= self._flush_size) or
+                (self._flush_interval is not None and
+                 time.monotonic() - self._buffer_time >= self._flush_interval)):
+            self._write_buffer()
+
+    def _write_buffer(self):
+        """Write out everything that is buffered, and flush the file."""
+        if len(self._buffer) > 0 and self._file is not None:
+            self._file.write(''.join(self._buffer))
+            self._file.flush()
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffer_time = None
+
     def __enter__(self):
         return self
 
@@ -665,7 +814,15 @@ class Serializer(event_model.DocumentRouter):
         """
         Stash the start document and reset the internal state
         """
+        self._write_buffer()
         self._start = doc
+        self._baseline_descriptor = None
+        self._baseline_event = None
+        self._primary_descriptor = None
+        self._descriptors = {}
+        self._line_formatters = {}
+        self._current_stream = None
+        self._has_not_written_scan_header = True
 
         try:
             self._file = self._manager.open(
@@ -684,7 +841,7 @@ class Serializer(event_model.DocumentRouter):
         filepath, = self._manager.artifacts['stream_data']
         header = to_spec_file_header(self._start, filepath,
                                      self._baseline_descriptor)
-        self._file.write(header)
+        self._write(header)
 
     def descriptor(self, doc):
         # if doc.get('name') == 'baseline':
@@ -697,23 +854,15 @@ class Serializer(event_model.DocumentRouter):
             # new file header
             # print("Find precount descriptor!")
             self._baseline_descriptor = doc
-        elif self._primary_descriptor:
-        
-            print(f"HERE is the {self._primary_descriptor.get('name')}") ## for testing, HZ ##
-            # we already have a primary descriptor, why are we getting
-            # another one?
-            err_msg = (
-                "The suitcase.specfile.Serializer is not designed to handle more "
-                "than one descriptor.  If you need this functionality, please "
-                "request it at https://github.com/NSLS-II/suitcase/issues. "
-                "Until that time, this DocumentToSpec callback will raise a "
-                "NotImplementedError if you try to use it with two event "
-                "streams.")
-            raise NotImplementedError(err_msg)
         else:
-            self._primary_descriptor = doc 
-            # if doc.get('name') == 'primary': ## HZ to test
-            #     self._primary_descriptor = doc
+            # The first stream is the primary one; any further streams get
+            # their own #L blocks (see event)
+            if self._primary_descriptor is None:
+                self._primary_descriptor = doc
+                self._line_formatters[doc['uid']] = compile_spec_scan_data(self._start, doc)
+            else:
+                self._line_formatters[doc['uid']] = compile_spec_stream_data(self._start, doc)
+            self._descriptors[doc['uid']] = doc
 
     def event(self, doc):
         if (self._baseline_descriptor and
@@ -733,25 +882,22 @@ class Serializer(event_model.DocumentRouter):
             scan_header = to_spec_scan_header(self._start,
                                               self._primary_descriptor,
                                               self._baseline_event)
-            self._file.write(scan_header)
+            self._write(scan_header)
             self._has_not_written_scan_header = False
+            self._current_stream = self._primary_descriptor['uid']
+
+        descriptor = self._descriptors[doc['descriptor']]
+        primary = descriptor is self._primary_descriptor
+        if doc['descriptor'] != self._current_stream:
+            # Switching streams: give the columns of the new stream
+            self._write(to_spec_stream_header(self._start, descriptor,
+                                              primary=primary))
+            self._current_stream = doc['descriptor']
 
-        if doc['descriptor'] != self._primary_descriptor['uid']:
-            err_msg = (
-                "The DocumentToSpec callback is not designed to handle more "
-                "than one event stream.  If you need this functionality, please "
-                "request it at https://github.com/NSLS-II/suitcase/issues. "
-                "Until that time, this DocumentToSpec callback will raise a "
-                "NotImplementedError if you try to use it with two event "
-                "streams.")
-            raise NotImplementedError(err_msg)
         self._num_events_received += 1
         # now write the scan data line
-        scan_data_line = to_spec_scan_data(self._start,
-                                           self._primary_descriptor, doc)
-        self._file.write(scan_data_line + '\n')
-        if self._flush:
-            self._file.flush()
+        scan_data_line = self._line_formatters[doc['descriptor']](doc)
+        self._write(scan_data_line + '\n')
 
     def stop(self, doc):
         msg = '\n'
@@ -760,6 +906,14 @@ class Serializer(event_model.DocumentRouter):
         if doc['exit_status'] != 'success':
             msg += ('#C Run exited with status: {exit_status}. Reason: '
                     '{reason}'.format(**doc))
-        self._file.write(msg)
-        if self._flush:
-            self._file.flush()
+        # Events that never reached us (e.g. dropped by a live export queue)
+        num_events = doc.get('num_events') or {}
+        num_expected = sum(num_events.get(descriptor.get('name'), 0)
+                           for descriptor in self._descriptors.values())
+        if num_expected > self._num_events_received:
+            if msg != '\n':
+                msg += '\n'
+            msg += '#C {} events were not exported.'.format(
+                num_expected - self._num_events_received)
+        self._write(msg)
+        self._write_buffer()
@@ -1,5 +1,8 @@
 # Initialize the filename to today's date.
 import time
+import queue
+import atexit
+import threading
 from event_model import RunRouter
 # from suitcase.specfile import Serializer
 
@@ -25,18 +28,139 @@ def spec_factory(name, doc):
 # Add plan names to this list to live export additional types of plans
     plan_alowed_list = {'scan', 'rel_scan', 'grid_scan' }
     if doc.get('plan_name', '') in plan_alowed_list:
-        return [Serializer(directory, file_prefix=file_prefix, flush=True)], []
+        # Buffer the output (the file is on network storage), and write it out
+        # every few seconds and at the end of the run
+        return [Serializer(directory, file_prefix=file_prefix, flush=True,
+                           flush_interval=2.0, flush_size=64*1024)], []
     else:
         return [], []
 
 
+class QueuedExport(object):
+    """Passes documents to a callback (e.g. a RunRouter of spec Serializers)
+    on a background thread, so that formatting and writing the files does not
+    run inside the RunEngine's document dispatch.
+
+    Documents are handled in the order they were received. The queue is
+    bounded: if it is full (the storage is slower than the scan), the
+    RunEngine waits for room. Optionally (block_timeout), an event can instead
+    be dropped after waiting that long, so that the scan is never held up for
+    long; dropped events are counted, and the spec file notes the missing
+    events at the end of the scan. Other documents (start, descriptor, stop,
+    ...) are never dropped. With drain_on_stop, the stop document of a run
+    waits (at most drain_timeout) until the whole run has been written, so
+    the file is complete as soon as the scan ends. Use drain() to wait until
+    everything queued has been written; this is also done when Python exits.
+    Use report() to see the backpressure statistics.
+    """
+
+    def __init__(self, callback, maxsize=10000, block_timeout=None, drain_on_stop=True, drain_timeout=30):
+        self.callback = callback
+        self.block_timeout = block_timeout
+        self.drain_on_stop = drain_on_stop
+        self.drain_timeout = drain_timeout
+        self.documents = queue.Queue(maxsize=maxsize)
+        self.errors = []
+        self.reset_metrics()
+        self._thread = None
+
+    def reset_metrics(self):
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0  # total time the RunEngine waited on a full queue
+        self.max_latency = 0.0  # longest time between receiving and writing a document
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="QueuedExport", daemon=True)
+            self._thread.start()
+
+    def __call__(self, name, doc):
+        self.start()
+        self.received += 1
+        item = (name, doc, time.time())
+        try:
+            self.documents.put_nowait(item)
+        except queue.Full:
+            start_time = time.time()
+            try:
+                self.documents.put(item, timeout=self.block_timeout if name == "event" else None)
+            except queue.Full:
+                self.dropped += 1
+            self.blocked_time += time.time() - start_time
+        self.max_depth = max(self.max_depth, self.documents.qsize())
+
+        if name == "stop" and self.drain_on_stop:
+            self.drain(timeout=self.drain_timeout)
+
+    def pending(self):
+        """Number of documents not yet written."""
+        return self.documents.unfinished_tasks
+
+    def _run(self):
+        while True:
+            name, doc, received_time = self.documents.get()
+            try:
+                self.callback(name, doc)
+                self.processed += 1
+            except Exception as e:
+                self.errors.append((name, doc.get("uid"), e))
+            finally:
+                self.max_latency = max(self.max_latency, time.time() - received_time)
+                self.documents.task_done()
+
+    def drain(self, timeout=None, verbosity=3):
+        """Wait until all queued documents have been written.
+
+        Returns True if the queue was fully drained."""
+        start_time = time.time()
+        with self.documents.all_tasks_done:
+            while self.documents.unfinished_tasks > 0:
+                if timeout is None:
+                    self.documents.all_tasks_done.wait()
+                else:
+                    remaining = timeout - (time.time() - start_time)
+                    if remaining <= 0:
+                        if verbosity >= 1:
+                            pending = self.documents.unfinished_tasks
+                            print("WARNING: {:d} documents not yet exported.".format(pending))
+                        return False
+                    self.documents.all_tasks_done.wait(remaining)
+        return True
+
+    def report(self, clear=True, verbosity=3):
+        """Print the backpressure statistics and the errors (optionally clearing them)."""
+        errors = self.errors
+        if verbosity >= 2:
+            print(
+                "  Export: {:d} received, {:d} written, {:d} pending, {:d} dropped; max queue depth {:d}, "
+                "blocked {:.3f} s, max latency {:.3f} s".format(
+                    self.received,
+                    self.processed,
+                    self.pending(),
+                    self.dropped,
+                    self.max_depth,
+                    self.blocked_time,
+                    self.max_latency,
+                )
+            )
+        if verbosity >= 1:
+            for name, uid, e in errors:
+                print("WARNING: Export of {} document {} failed: {}".format(name, uid, e))
+        if clear:
+            self.errors = []
+            self.reset_metrics()
+        return errors
+
+
 run_router = RunRouter([spec_factory])
-RE.subscribe(run_router)
+spec_export = QueuedExport(run_router)
+RE.subscribe(spec_export)
+atexit.register(spec_export.drain, timeout=30)
 
 
-#run_router = RunRouter([spec_factory])
-#RE.subscribe(run_router)
-# NotImplementedError: The suitcase.specfile.Serializer is not designed to handle more than one descriptor.  If you need this functionality, please request it at https://github.com/NSLS-II/suitcase/issues. Until that time, this DocumentToSpec callback will raise a NotImplementedError if you try to use it with two event streams.
 
 #this is run to install pymca
 #conda create -n pymca_testing python
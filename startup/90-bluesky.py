@@ -364,6 +364,7 @@ CMS_CONFIG_FILENAME = os.path.join(PROFILE_ROOT, ".cms_config")
 
 ## CMS config file
 import pandas as pds
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 def config_update():
@@ -432,29 +433,159 @@ def config_load():
 
 
 ## output the scan data and save them in user_folder/data.
-def data_output(experiment_cycle=None, experiment_alias_directory=None):
+def export_table(header, output_dir=None, file_format="csv", compression=None, overwrite=False):
+    """Write the data table of one run to {output_dir}/{scan_id}.csv (or .parquet).
+
+    By default, output_dir is the 'data' folder of the run's
+    experiment_alias_directory. The file is not rewritten if it already
+    exists and is newer than the end of the run (unless overwrite).
+
+    Returns (filename, status), where status is 'written' or 'skipped'.
+    """
+    start = header.start
+    if output_dir is None:
+        output_dir = os.path.join(start.get("experiment_alias_directory"), "data")
+
+    extension = {"csv": ".csv", "parquet": ".parquet"}[file_format]
+    if file_format == "csv" and compression is not None:
+        compression_extensions = {"gzip": ".gz", "bz2": ".bz2", "xz": ".xz", "zip": ".zip", "zstd": ".zst"}
+        extension += compression_extensions.get(compression, "")
+    filename = os.path.join(output_dir, "{}{}".format(start.get("scan_id"), extension))
+
+    if not overwrite and os.path.isfile(filename):
+        stop = header.stop
+        if stop is not None and os.path.getmtime(filename) >= stop["time"]:
+            return filename, "skipped"
+
+    dtable = header.table()
+
+    # Write to a temporary file first, so that an interrupted export does not
+    # leave a partial file that would later be taken as up to date.
+    temp_filename = "{}.part".format(filename)
+    try:
+        if file_format == "parquet":
+            dtable.to_parquet(temp_filename, compression="snappy" if compression is None else compression)
+        else:
+            dtable.to_csv(temp_filename, compression=compression)
+        os.replace(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+    return filename, "written"
+
+
+def export_tables(
+    scan_ids=None,
+    query=None,
+    output_dir=None,
+    file_format="csv",
+    compression=None,
+    overwrite=False,
+    max_workers=8,
+    verbosity=3,
+):
+    """
+    Export the data tables of many runs (e.g. at the end of a beamtime), using
+    a pool of threads to load the runs from databroker and write the files.
+
+    Parameters
+    ----------
+    scan_ids : list, optional
+        The scan_ids (or uids) of the runs to export.
+    query : dict, optional
+        A databroker query, used if scan_ids is not given; e.g.
+        {'experiment_alias_directory': '/nsls2/data/cms/legacy/xf11bm/data/2024_1/UShell'}
+    output_dir : str, optional
+        Where to write the files (default: the 'data' folder of each run's
+        experiment_alias_directory, which must exist).
+    file_format : 'csv' or 'parquet'
+    compression : str, optional
+        e.g. 'gzip' for CSV (written as .csv.gz), 'zstd' for Parquet.
+    overwrite : bool
+        Rewrite outputs that already exist and are up to date.
+
+    Returns
+    -------
+    DataFrame with the scan_id, filename and status ('written', 'skipped',
+    or the error) of each run.
+    """
+
+    if file_format not in ["csv", "parquet"]:
+        print("ERROR: Unknown file format {} (use 'csv' or 'parquet').".format(file_format))
+        return None
+    if scan_ids is not None:
+        headers = (lambda scan_id=scan_id: db[scan_id] for scan_id in scan_ids)
+    elif query is not None:
+        headers = (lambda header=header: header for header in db(**query))
+    else:
+        print("ERROR: Specify the runs to export (scan_ids or query).")
+        return None
+
+    def export(get_header):
+        try:
+            header = get_header()
+        except Exception as e:
+            return {"scan_id": None, "filename": None, "status": "failed: {}".format(e)}
+        try:
+            filename, status = export_table(
+                header,
+                output_dir=output_dir,
+                file_format=file_format,
+                compression=compression,
+                overwrite=overwrite,
+            )
+        except Exception as e:
+            filename, status = None, "failed: {}".format(e)
+        return {"scan_id": header.start.get("scan_id"), "filename": filename, "status": status}
+
+    results = []
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit the runs as the query produces them (with a bounded number
+        # in flight), so that the files are written as we go.
+        for get_header in headers:
+            pending.add(executor.submit(export, get_header))
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results += [future.result() for future in done]
+                if verbosity >= 3 and len(results) % 100 < len(done):
+                    print("  {:d} runs exported".format(len(results)))
+        results += [future.result() for future in pending]
+
+    results = pds.DataFrame(results, columns=["scan_id", "filename", "status"])
+    if verbosity >= 2:
+        counts = results["status"].where(results["status"].isin(["written", "skipped"]), "failed").value_counts()
+        print(
+            "Exported {:d} runs: {:d} written, {:d} up to date, {:d} failed".format(
+                len(results), counts.get("written", 0), counts.get("skipped", 0), counts.get("failed", 0)
+            )
+        )
+    if verbosity >= 1:
+        failed = results[~results["status"].isin(["written", "skipped"])]
+        for scan_id, status in failed[["scan_id", "status"]].values:
+            print("WARNING: Export of scan {} {}".format(scan_id, status))
+
+    return results
+
+
+def data_output(experiment_cycle=None, experiment_alias_directory=None, **kwargs):
     """
     To output the scan data with the scan_id as name
     Please first create "data" folder under user_folder.
+    (See export_tables for the options.)
     """
 
     # headers = db(experiment_cycle='2017_3', experiment_group= 'I. Herman (Columbia U.) group', experiment_alias_directory='/nsls2/xf11bm/data/2017_3/IHerman' )
     if experiment_cycle is not None:
-        headers = db(
+        query = dict(
             experiment_cycle=experiment_cycle,
             experiment_alias_directory=experiment_alias_directory,
         )
     else:
-        headers = db(experiment_alias_directory=experiment_alias_directory)
+        query = dict(experiment_alias_directory=experiment_alias_directory)
 
-    for header in headers:
-        dtable = header.table()
-        dtable.to_csv(
-            "{}/data/{}.csv".format(
-                header.get("start").get("experiment_alias_directory"),
-                header.get("start").get("scan_id"),
-            )
-        )
+    return export_tables(query=query, **kwargs)
 
 
 # def data_output_series(mdkeys, experiment_cycle=None, experiment_alias_directory=None):
@@ -483,22 +614,15 @@ def data_output(experiment_cycle=None, experiment_alias_directory=None):
 
 
 ## output the scan data and save them in user_folder/data.
-def data_output_seires(id_range):
+def data_output_seires(id_range, **kwargs):
     """
     To output the scan data with the scan_id as name
     Please first create "data" folder under user_folder.
     id_range = np.arange(55123, 56354)
+    (See export_tables for the options.)
     """
 
-    for ii in id_range:
-        header = db[scan_id]
-        dtable = header.table()
-        dtable.to_csv(
-            "{}/data/{}.csv".format(
-                header.get("start").get("experiment_alias_directory"),
-                header.get("start").get("scan_id"),
-            )
-        )
+    return export_tables(scan_ids=[int(ii) for ii in id_range], **kwargs)
 
 
 # def XRR_data_output(experiment_ids=None)
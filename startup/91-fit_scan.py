@@ -4,6 +4,8 @@
 print(f'Loading {__file__}')
 
 import glob
+import bisect
+from concurrent.futures import ThreadPoolExecutor
 from bluesky.callbacks import CallbackBase
 
 
@@ -149,9 +151,139 @@ class LiveTable_Custom(LiveTable):
         super().stop(doc)
 
 
+class RunningStats(object):
+    """
+    Accumulates (x,y) points, keeping what is needed to compute the LiveStat
+    statistics without going over all the points again for each new point:
+    preallocated arrays (doubled in size as needed), running sums for the
+    center of mass, the running argmax/argmin, and the y values on either
+    side of the maximum kept sorted (with bisect) to find the points closest
+    to half-maximum. Points only ever move from the right of the maximum to
+    its left, so each is inserted at most twice.
+
+    For the half-maximum crossings, the suffix minima of the points left of
+    the maximum are kept in a stack (the last point below a value is on it),
+    together with the first point right of the maximum below half of it.
+    """
+
+    def __init__(self, capacity=64):
+        self._x = np.zeros(capacity)
+        self._y = np.zeros(capacity)
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xy = 0.0
+        self.idx_max = None
+        self.idx_min = None
+        self.left = []  # sorted (y, index) for the points before the maximum
+        self.right = []  # sorted (y, index) for the maximum and the points after it
+        self.left_minima = []  # (y, index) for the points before the maximum with no lower point after them
+        self.right_below_hm = None  # first index from the maximum on with y below half the maximum
+
+    @property
+    def x(self):
+        return self._x[: self.n]
+
+    @property
+    def y(self):
+        return self._y[: self.n]
+
+    def _reserve(self, n):
+        if n > len(self._x):
+            capacity = max(n, 2 * len(self._x))
+            for name in ["_x", "_y"]:
+                array = np.zeros(capacity)
+                array[: self.n] = getattr(self, name)[: self.n]
+                setattr(self, name, array)
+
+    def append(self, x, y):
+        i = self.n
+        self._reserve(i + 1)
+        self._x[i] = x
+        self._y[i] = y
+        self.n += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xy += x * y
+
+        if self.idx_min is None or y < self._y[self.idx_min]:
+            self.idx_min = i
+        if self.idx_max is None or y > self._y[self.idx_max]:
+            # Everything measured so far is now left of the maximum
+            for point in sorted(self.right, key=lambda point: point[1]):
+                bisect.insort(self.left, point)
+                self._push_left_minimum(point)
+            self.idx_max = i
+            self.right = [(y, i)]
+            self.right_below_hm = None
+        else:
+            bisect.insort(self.right, (y, i))
+            if self.right_below_hm is None and y < 0.5 * self._y[self.idx_max]:
+                self.right_below_hm = i
+
+    def _push_left_minimum(self, point):
+        while len(self.left_minima) > 0 and self.left_minima[-1][0] >= point[0]:
+            self.left_minima.pop()
+        self.left_minima.append(point)
+
+    def extend(self, xs, ys):
+        """Add many points at once."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        if self.n == 0 and len(ys) > 0:
+            self._reserve(len(ys))
+            self._x[: len(xs)] = xs
+            self._y[: len(ys)] = ys
+            self.n = len(ys)
+            self.sum_x = float(np.sum(xs))
+            self.sum_y = float(np.sum(ys))
+            self.sum_xy = float(np.sum(xs * ys))
+            self.idx_max = int(np.argmax(ys))
+            self.idx_min = int(np.argmin(ys))
+            self.left = sorted(zip(ys[: self.idx_max].tolist(), range(self.idx_max)))
+            self.right = sorted(zip(ys[self.idx_max :].tolist(), range(self.idx_max, self.n)))
+            self.left_minima = []
+            for point in zip(ys[: self.idx_max].tolist(), range(self.idx_max)):
+                self._push_left_minimum(point)
+            below = np.nonzero(ys[self.idx_max :] < 0.5 * ys[self.idx_max])[0]
+            self.right_below_hm = self.idx_max + int(below[0]) if len(below) > 0 else None
+        else:
+            for x, y in zip(xs, ys):
+                self.append(x, y)
+
+    def left_below(self, value):
+        """Index of the last point left of the maximum with y below value, or
+        None if there is none."""
+        i = bisect.bisect_left(self.left_minima, (value, -1))
+        return self.left_minima[i - 1][1] if i > 0 else None
+
+    @staticmethod
+    def closest(sorted_values, value):
+        """Index of the point in sorted_values [(y, index), ...] with y closest
+        to value (the earliest point in case of a tie), or None if none of the
+        y values are below value."""
+        if len(sorted_values) < 1 or sorted_values[0][0] >= value:
+            return None
+        i = bisect.bisect_left(sorted_values, (value, -1))
+        y_below = sorted_values[i - 1][0]
+        # Earliest point having that y
+        below = sorted_values[bisect.bisect_left(sorted_values, (y_below, -1))]
+        if i >= len(sorted_values):
+            return below[1]
+        above = sorted_values[i]
+        d_below = abs(y_below - value)
+        d_above = abs(above[0] - value)
+        if d_below < d_above or (d_below == d_above and below[1] < above[1]):
+            return below[1]
+        return above[1]
+
+
 class LiveStat(CallbackBase):
     """
     Calculate simple statistics for an (x,y) curve.
+
+    The points are accumulated in a RunningStats, so that each update costs
+    (nearly) constant time, rather than growing with the number of points.
     """
 
     # Note: Follows the style/naming of class LiveFit(CallbackBase),
@@ -163,8 +295,7 @@ class LiveStat(CallbackBase):
         self.x_name = x_name
         self.update_every = update_every
 
-        self.ydata = []
-        self.xdata = []
+        self.stats = RunningStats()
 
         class Result(object):
             pass
@@ -172,6 +303,24 @@ class LiveStat(CallbackBase):
         self.result = Result()  # Dummy object to replicate the hiearchy expected for LiveFit
         self.result.values = {}
 
+    @property
+    def xdata(self):
+        return self.stats.x
+
+    @property
+    def ydata(self):
+        return self.stats.y
+
+    @classmethod
+    def from_table(cls, table, stat, y_name, x_name):
+        """Compute the statistic(s) for data that was already measured, e.g. the
+        table of a past run (db[uid].table()) or a dict of arrays."""
+        livestat = cls(stat, y_name, x_name)
+        livestat.stats.extend(table[x_name], table[y_name])
+        for stat in stat if type(stat) is list else [stat]:
+            livestat.update_fit(stat)
+        return livestat
+
     def event(self, doc):
         if self.y_name not in doc["data"]:
             return
@@ -179,8 +328,7 @@ class LiveStat(CallbackBase):
         y = doc["data"][self.y_name]
         x = doc["data"][self.x_name]
 
-        self.ydata.append(y)
-        self.xdata.append(x)
+        self.stats.append(x, y)
 
         if self.update_every is not None:
             i = doc["seq_num"]
@@ -194,49 +342,44 @@ class LiveStat(CallbackBase):
         super().event(doc)
 
     def update_fit(self, stat):
-        xs = np.asarray(self.xdata)
-        ys = np.asarray(self.ydata)
+        stats = self.stats
+        xs = stats.x
+        ys = stats.y
 
-        if stat is "max":
-            idx = np.argmax(ys)
-            x0 = xs[idx]
-            y0 = ys[idx]
+        if stat == "max":
+            x0 = xs[stats.idx_max]
+            y0 = ys[stats.idx_max]
 
             self.result.values["x_max"] = x0
             self.result.values["y_max"] = y0
 
-        elif stat is "min":
-            idx = np.argmin(ys)
-            x0 = xs[idx]
-            y0 = ys[idx]
+        elif stat == "min":
+            x0 = xs[stats.idx_min]
+            y0 = ys[stats.idx_min]
 
             self.result.values["x_min"] = x0
             self.result.values["y_min"] = y0
 
-        elif stat is "COM":
-            x0 = np.sum(xs * ys) / np.sum(ys)
+        elif stat == "COM":
+            x0 = stats.sum_xy / stats.sum_y
             y0 = np.interp(x0, xs, ys)
 
             self.result.values["x_COM"] = x0
             self.result.values["y_COM"] = y0
 
-        elif stat is "HM":
+        elif stat == "HM":
             """Half-maximum, using the point(s) closest to HM."""
-            idx_max = np.argmax(ys)
-            half_max = 0.5 * ys[idx_max]
+            half_max = 0.5 * ys[stats.idx_max]
 
             l = None
             r = None
 
-            left = ys[:idx_max]
-            right = ys[idx_max:]
-
-            if len(left) > 0 and left.min() < half_max:
-                idx_hm = np.abs(left - half_max).argmin()
-                l = xs[:idx_max][idx_hm]
-            if len(right) > 0 and right.min() < half_max:
-                idx_hm = np.abs(right - half_max).argmin()
-                r = xs[idx_max:][idx_hm]
+            idx_hm = stats.closest(stats.left, half_max)
+            if idx_hm is not None:
+                l = xs[idx_hm]
+            idx_hm = stats.closest(stats.right, half_max)
+            if idx_hm is not None:
+                r = xs[idx_hm]
 
             if l is None:
                 x0 = r
@@ -246,29 +389,26 @@ class LiveStat(CallbackBase):
                 x0 = np.average([l, r])
 
             if x0 is None:
-                x0 = np.average(xs)
+                x0 = stats.sum_x / stats.n
 
             y0 = np.interp(x0, xs, ys)
             self.result.values["x_HM"] = x0
             self.result.values["y_HM"] = y0
 
-        elif stat is "HMi":
+        elif stat == "HMi":
             """Half-maximum, with averaging of values near HW."""
-            idx_max = np.argmax(ys)
+            idx_max = stats.idx_max
             half_max = 0.5 * ys[idx_max]
 
             l = None
             r = None
 
-            left = ys[:idx_max]
-            right = ys[idx_max:]
-
-            if len(left) > 0 and left.min() < half_max and left.max() > half_max:
-                idx = np.where(left < half_max)[0][-1]
-                l = np.average([xs[:idx_max][idx], xs[:idx_max][idx + 1]])
-            if len(right) > 0 and right.min() < half_max and right.max() > half_max:
-                idx = np.where(right < half_max)[0][0]
-                r = np.average([xs[idx_max:][idx - 1], xs[idx_max:][idx]])
+            if len(stats.left) > 0 and stats.left[0][0] < half_max and stats.left[-1][0] > half_max:
+                idx = stats.left_below(half_max)
+                l = np.average([xs[idx], xs[idx + 1]])
+            if len(stats.right) > 0 and stats.right[0][0] < half_max and stats.right[-1][0] > half_max:
+                idx = stats.right_below_hm
+                r = np.average([xs[idx - 1], xs[idx]])
 
             if l is None:
                 x0 = r
@@ -278,7 +418,7 @@ class LiveStat(CallbackBase):
                 x0 = np.average([l, r])
 
             if x0 is None:
-                x0 = np.average(xs)
+                x0 = stats.sum_x / stats.n
 
             y0 = np.interp(x0, xs, ys)
             self.result.values["x_HM"] = x0
@@ -375,12 +515,12 @@ class LiveStatPlot(LivePlot):
             self.update_plot()
         # Intentionally override LivePlot.event. Do not call super().
 
-        self.update_plot()
-
     def update_plot(self):
-        super().update_plot()
-
+        # Only the marker and the x0 line change: redraw them through
+        # fit_figures, within the limits set by the data plot (no relim)
+        self.current_line.set_data(self.x_data, self.y_data)
         self.x0_line.set_xdata([self.x_data[0]])
+        fit_figures.update(self.ax, [self.current_line, self.x0_line])
 
     def descriptor(self, doc):
         self.livestat.descriptor(doc)
@@ -611,9 +751,12 @@ class LiveFitPlot_Custom(LiveFitPlot):
         self.x0_line.custom_tag_x0 = True
 
     def update_plot(self):
+        # Only the fit curve and the x0 line change: redraw them through
+        # fit_figures, within the limits set by the data plot (no relim)
         x0 = self.livefit.result.values["x0"]
         self.x0_line.set_xdata([x0])
-        super().update_plot()
+        self.current_line.set_data(self.x_data, self.y_data)
+        fit_figures.update(self.ax, [self.current_line, self.x0_line])
 
 
 class LiveFit_Custom(LiveFit):
@@ -635,12 +778,24 @@ class LiveFit_Custom(LiveFit):
     update_every : int or None, optional
         How often to recompute the fit. If `None`, do not compute until the
         end. Default is 1 (recompute after each new point).
+    warm_start : bool, optional
+        Start each refit from the parameters of the previous (successful)
+        fit, rather than from the initial guess.
+    adaptive : bool, optional
+        Once the fit parameters are stable (relative change below stable_rtol
+        for successive fits), skip refits: the interval between refits doubles
+        each time the parameters are still stable, up to max_skip updates.
+        Any significant change returns to refitting at every update. The fit
+        is always redone at the end of the scan.
 
     Attributes
     ----------
     result : lmfit.ModelResult
     """
 
+    # The lmfit models, keyed by (model_name, background); see get_composite_model
+    _models = {}
+
     def __init__(
         self,
         model_name,
@@ -649,6 +804,10 @@ class LiveFit_Custom(LiveFit):
         scan_range,
         update_every=1,
         background=None,
+        warm_start=True,
+        adaptive=True,
+        stable_rtol=1e-3,
+        max_skip=8,
     ):
         self.x_start = min(scan_range)
         self.x_stop = max(scan_range)
@@ -665,18 +824,13 @@ class LiveFit_Custom(LiveFit):
         if model_name in substitutions.keys():
             model_name = substitutions[model_name]
 
-        lm_model = self.get_model(model_name)
+        lm_model = self.get_composite_model(model_name, background)
         init_guess = self.get_initial_guess(model_name)
 
         # Add additional models (if any)
         if background is not None:
-            if type(background) is list:
-                for back in background:
-                    lm_model += self.get_model(back)
-                    init_guess.update(self.get_initial_guess(back))
-            else:
-                lm_model += self.get_model(background)
-                init_guess.update(self.get_initial_guess(background))
+            for back in background if type(background) is list else [background]:
+                init_guess.update(self.get_initial_guess(back))
 
         super().__init__(
             lm_model,
@@ -686,25 +840,116 @@ class LiveFit_Custom(LiveFit):
             update_every=update_every,
         )
 
-    def get_model(self, model_name):
-        if model_name is "gauss":
+        self.initial_guess = init_guess
+        self.warm_start = warm_start
+        self.adaptive = adaptive
+        self.stable_rtol = stable_rtol
+        self.max_skip = max_skip
+        self._skip_interval = 1  # refit every this many updates
+        self._skipped = 0
+        self._force_refit = False
+
+    @classmethod
+    def get_composite_model(cls, model_name, background=None):
+        """Return the (cached) lmfit model for the named model function plus
+        the background model(s)."""
+        if background is None:
+            backgrounds = ()
+        elif type(background) is list:
+            backgrounds = tuple(background)
+        else:
+            backgrounds = (background,)
+        key = (model_name, backgrounds)
+        if key not in cls._models:
+            lm_model = cls.get_model(model_name)
+            for back in backgrounds:
+                lm_model += cls.get_model(back)
+            cls._models[key] = lm_model
+        return cls._models[key]
+
+    def _warm_guess(self):
+        """Initial guess from the previous fit (keeping the bounds of the parameters)."""
+        return {
+            name: lmfit.Parameter(name, param.value, min=param.min, max=param.max, vary=param.vary)
+            for name, param in self.result.params.items()
+            if param.expr is None and np.isfinite(param.value)
+        }
+
+    def _is_stable(self, previous):
+        """Whether the parameters of the last fit are within stable_rtol of the previous ones."""
+        for name, value in self.result.params.valuesdict().items():
+            if name not in previous:
+                return False
+            scale = max(abs(previous[name]), self.x_span if name == "x0" else 0, 1e-12)
+            if abs(value - previous[name]) > self.stable_rtol * scale:
+                return False
+        return True
+
+    def update_fit(self):
+        if self.adaptive and not self._force_refit and self._skip_interval > 1:
+            self._skipped += 1
+            if self._skipped < self._skip_interval:
+                return  # The fit stays stale, so it is redone at stop
+        self._skipped = 0
+
+        previous = None
+        if self.result is not None and self.result.success:
+            previous = self.result.params.valuesdict()
+            if self.warm_start:
+                self.init_guess = self._warm_guess()
+        else:
+            self.init_guess = self.initial_guess
+
+        super().update_fit()
+
+        if self.result is None or not self.result.success:
+            # Start over from the initial guess next time
+            self.init_guess = self.initial_guess
+            self._skip_interval = 1
+        elif previous is not None and self._is_stable(previous):
+            self._skip_interval = min(self._skip_interval * 2, self.max_skip)
+        else:
+            self._skip_interval = 1
+
+    def start(self, doc):
+        self.init_guess = self.initial_guess
+        self._skip_interval = 1
+        self._skipped = 0
+        super().start(doc)
+
+    def stop(self, doc):
+        # Make sure the final fit uses all the data (LiveFit.stop calls
+        # update_fit without arguments, hence the flag)
+        self._force_refit = True
+        try:
+            super().stop(doc)
+        finally:
+            self._force_refit = False
+
+    @staticmethod
+    def get_model(model_name):
+        """Return the lmfit.Model for the named model function. This does not
+        depend on the scan data, so it can also be used outside of a live fit
+        (e.g. LiveFit_Custom.get_model('erf'))."""
+
+        if model_name == "gauss":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor * np.exp(-((x - x0) ** 2) / (2 * sigma**2))
 
-        elif model_name is "lorentz":
+        elif model_name == "lorentz":
 
             def model_function(x, x0, prefactor, gamma):
                 return prefactor * (gamma**2) / ((x - x0) ** 2 + (gamma**2))
 
-        elif model_name is "doublesigmoid":
+        elif model_name == "doublesigmoid":
 
             def model_function(x, x0, prefactor, sigma, fwhm):
                 left = prefactor / (1 + np.exp(-(x - (x0 - fwhm * 0.5)) / sigma))
                 right = prefactor / (1 + np.exp(-(x - (x0 + fwhm * 0.5)) / sigma))
                 return prefactor * (left - right)
 
-        elif model_name is "square":
+        elif model_name == "square":
 
             def model_function(x, x0, prefactor, fwhm):
                 sigma = fwhm * 0.02
@@ -712,54 +957,54 @@ class LiveFit_Custom(LiveFit):
                 right = prefactor / (1 + np.exp(-(x - (x0 + fwhm * 0.5)) / sigma))
                 return prefactor * (left - right)
 
-        elif model_name is "sigmoid":
+        elif model_name == "sigmoid":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor / (1 + np.exp(-(x - x0) / sigma))
 
-        elif model_name is "sigmoid_r":
+        elif model_name == "sigmoid_r":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor / (1 + np.exp(+(x - x0) / sigma))
 
-        elif model_name is "step":
+        elif model_name == "step":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor / (1 + np.exp(-(x - x0) / sigma))
 
-        elif model_name is "step_r":
+        elif model_name == "step_r":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor / (1 + np.exp(+(x - x0) / sigma))
 
-        elif model_name is "tanh":
+        elif model_name == "tanh":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor * 0.5 * (np.tanh((x - x0) / sigma) + 1.0)
 
-        elif model_name is "tanh_r":
+        elif model_name == "tanh_r":
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor * 0.5 * (np.tanh(-(x - x0) / sigma) + 1.0)
 
-        elif model_name is "erf":
+        elif model_name == "erf":
             import scipy
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor * 0.5 * (scipy.special.erf((x - x0) / sigma) + 1.0)
 
-        elif model_name is "erf_r":
+        elif model_name == "erf_r":
             import scipy
 
             def model_function(x, x0, prefactor, sigma):
                 return prefactor * 0.5 * (scipy.special.erf(-(x - x0) / sigma) + 1.0)
 
-        elif model_name is "constant":
+        elif model_name == "constant":
 
             def model_function(x, offset):
                 return x * 0 + offset
 
-        elif model_name is "linear":
+        elif model_name == "linear":
 
             def model_function(x, m, b):
                 return m * x + b
@@ -883,6 +1128,139 @@ class LiveFit_Custom(LiveFit):
 import lmfit
 
 
+class FitFigurePool(object):
+    """
+    Keeps one figure per (detector, motor) for the live plots of fit_scan,
+    so that successive scans reuse the same figure/axes (rather than searching
+    all open figures by window title), and updates the data lines by
+    blitting: only the lines are redrawn, and the rest of the figure is
+    redrawn only when the axis limits change.
+
+    In headless mode (e.g. when running unattended from a queue), no figures
+    are made and fit_scan does not plot at all.
+    """
+
+    def __init__(self, headless=False, figsize=(11, 7)):
+        self.headless = headless
+        self.figsize = figsize
+        self.figures = {}  # (detector name, motor name) --> figure
+        self._blit = {}  # figure --> blitting state
+
+    def get_axes(self, detector_name, motor_name):
+        """Return the axes to plot motor vs. detector (None in headless mode)."""
+        if self.headless:
+            return None
+
+        key = (detector_name, motor_name)
+        fig = self.figures.get(key)
+        if fig is None or not plt.fignum_exists(fig.number):
+            self._blit.pop(fig, None)
+            fig = plt.figure(figsize=self.figsize, facecolor="white")
+            if fig.canvas.manager is not None:
+                if fig.canvas.manager.toolbar is not None:
+                    fig.canvas.manager.toolbar.pan()
+                fig.canvas.manager.set_window_title("fit_scan: {} vs. {}".format(detector_name, motor_name))
+            self.figures[key] = fig
+
+        return fig.gca()
+
+    def _state(self, fig):
+        if fig not in self._blit:
+            state = {"background": None, "limits": {}, "artists": []}
+            self._blit[fig] = state
+
+            def on_draw(event):
+                # A full redraw: keep it (without the animated lines) as the background
+                state["background"] = fig.canvas.copy_from_bbox(fig.bbox)
+                for artist in state["artists"]:
+                    fig.draw_artist(artist)
+
+            fig.canvas.mpl_connect("draw_event", on_draw)
+        return self._blit[fig]
+
+    def update(self, ax, artists):
+        """Redraw the artists (whose data changed) of the axes. The artists
+        stay animated (left out of the background) until release(), and are
+        all redrawn at each update, so several callbacks (data line, fit
+        curve, x0 marker) can share the figure."""
+        fig = ax.figure
+        if not getattr(fig.canvas, "supports_blit", False):
+            fig.canvas.draw_idle()
+            return
+
+        state = self._state(fig)
+        # Forget the artists that were removed from the figure
+        state["artists"] = [artist for artist in state["artists"] if artist.figure is fig]
+        for artist in artists:
+            if artist not in state["artists"]:
+                artist.set_animated(True)
+                state["artists"].append(artist)
+
+        limits = (ax.get_xlim(), ax.get_ylim())
+        if state["background"] is None or state["limits"].get(ax) != limits:
+            state["limits"][ax] = limits
+            fig.canvas.draw_idle()
+            return
+
+        fig.canvas.restore_region(state["background"])
+        for artist in state["artists"]:
+            fig.draw_artist(artist)
+        fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
+
+    def release(self, ax):
+        """Stop animating the artists of the axes (e.g. the lines of the
+        previous scan), so that they become part of the background."""
+        fig = ax.figure
+        state = self._blit.get(fig)
+        if state is None:
+            return
+        for artist in state["artists"]:
+            if artist.axes is ax:
+                artist.set_animated(False)
+        state["artists"] = [artist for artist in state["artists"] if artist.axes is not ax]
+        state["background"] = None
+        fig.canvas.draw_idle()
+
+
+fit_figures = FitFigurePool()
+
+
+class LivePlot_Pooled(LivePlot):
+    """LivePlot that redraws its line through fit_figures (blitting). The x
+    range is fixed to the scan range, and the y range only grows (with some
+    headroom), so that the axes rarely need a full redraw."""
+
+    def __init__(self, y, x=None, *, scan_range=None, headroom=0.25, **kwargs):
+        super().__init__(y, x, **kwargs)
+        self.scan_range = scan_range
+        self.headroom = headroom
+
+    def start(self, doc):
+        # The lines of the previous scan are no longer updated
+        fit_figures.release(self.ax)
+        super().start(doc)
+        # The y range is re-established for each scan
+        self.ax.set_autoscaley_on(True)
+
+    def update_plot(self):
+        self.current_line.set_data(self.x_data, self.y_data)
+
+        if self.scan_range is not None:
+            x_start, x_stop = min(self.scan_range), max(self.scan_range)
+            margin = abs(x_stop - x_start) * 0.02
+            if self.ax.get_xlim() != (x_start - margin, x_stop + margin):
+                self.ax.set_xlim(x_start - margin, x_stop + margin)
+
+        ymin, ymax = np.min(self.y_data), np.max(self.y_data)
+        bottom, top = self.ax.get_ylim()
+        if self.ax.get_autoscaley_on() or ymin < bottom or ymax > top:
+            span = max(ymax - ymin, abs(ymax) * 0.1, 1e-12)
+            self.ax.set_ylim(ymin - span * self.headroom, ymax + span * self.headroom)
+
+        fit_figures.update(self.ax, [self.current_line])
+
+
 def fit_scan(
     motor,
     span,
@@ -897,6 +1275,7 @@ def fit_scan(
     wait_time=None,
     md={},
     save_flg=0,
+    fly=False,
 ):
     """
     Scans the specified motor, and attempts to fit the data as requested.
@@ -923,8 +1302,25 @@ def fit_scan(
             constant, linear
     md : dict, optional
         metadata
+    fly : bool
+        If True, the scan is done with continuous motion of the motor while
+        the detector acquires a burst of frames (see fly_scan).
     """
 
+    if fly:
+        return fly_scan(
+            motor,
+            span,
+            num=num,
+            detectors=detectors,
+            detector_suffix=detector_suffix,
+            exposure_time=exposure_time,
+            toggle_beam=toggle_beam,
+            fit=fit,
+            background=background,
+            md=md,
+        )
+
     # TODO: Normalize per ROI pixel and per count_time?
     # TODO: save scan data with save_flg=1.
 
@@ -956,35 +1352,17 @@ def fit_scan(
     else:
         plot_y = "{}{}".format(detectors[0].name, detector_suffix)
 
-    # Get axes for plotting
-    title = "fit_scan: {} vs. {}".format(detectors[0].name, motor.name)
-    # if len(plt.get_fignums())>0:
-    # Try to use existing figure
-    # fig = plt.gcf() # Most recent figure
-
-    fig = None
-    for i in plt.get_fignums():
-        title_cur = plt.figure(i).canvas.manager.window.windowTitle()
-        if title_cur == title:
-            fig = plt.figure(i)
-            break
-
-    if fig is None:
-        # New figure
-        # fig, ax = plt.subplots()
-        fig = plt.figure(figsize=(11, 7), facecolor="white")
-        fig.canvas.manager.toolbar.pan()
-
-    fig.canvas.manager.set_window_title(title)
-    ax = fig.gca()
+    # Get axes for plotting (the same figure is reused for this detector and motor)
+    ax = fit_figures.get_axes(detectors[0].name, motor.name)
 
     subs = []
 
     livetable = LiveTable([motor] + list(detectors))
     # subs.append(livetable)
     # liveplot = LivePlot_Custom(plot_y, motor.name, ax=ax)
-    liveplot = LivePlot(plot_y, motor.name, ax=ax)
-    subs.append(liveplot)
+    if ax is not None:
+        liveplot = LivePlot_Pooled(plot_y, motor.name, ax=ax, scan_range=[start, stop])
+        subs.append(liveplot)
 
     if wait_time is not None:
         subs.append(MotorWait(motor, wait_time))
@@ -992,9 +1370,11 @@ def fit_scan(
     if fit in ["max", "min", "COM", "HM", "HMi"] or type(fit) is list:
         livefit = LiveStat(fit, plot_y, motor.name)
 
-        livefitplot = LiveStatPlot(livefit, ax=ax, scan_range=[start, stop])
-
-        subs.append(livefitplot)
+        if ax is None:
+            subs.append(livefit)
+        else:
+            livefitplot = LiveStatPlot(livefit, ax=ax, scan_range=[start, stop])
+            subs.append(livefitplot)
 
     elif fit is not None:
         # Perform a fit
@@ -1008,16 +1388,20 @@ def fit_scan(
             background=background,
         )
 
-        # livefitplot = LiveFitPlot(livefit, color='k')
-        livefitplot = LiveFitPlot_Custom(livefit, ax=ax, scan_range=[start, stop])
-
-        subs.append(livefitplot)
+        if ax is None:
+            subs.append(livefit)
+        else:
+            # livefitplot = LiveFitPlot(livefit, color='k')
+            livefitplot = LiveFitPlot_Custom(livefit, ax=ax, scan_range=[start, stop])
+            subs.append(livefitplot)
 
     md["plan_header_override"] = "fit_scan"
     md["scan"] = "fit_scan"
     md["measure_type"] = "fit_scan_{}".format(motor.name)
     md["fit_function"] = fit
     md["fit_background"] = background
+    md["fit_x"] = motor.name
+    md["fit_y"] = plot_y
 
     # cms.SAXS.detector.setExposureTime(exposure_time)
     RE(cms.SAXS.detector.setExposureTime(exposure_time))
@@ -1062,6 +1446,371 @@ def fit_scan(
         return livefit.result
 
 
+def fly_scan(
+    motor,
+    span,
+    num=41,
+    detectors=None,
+    detector_suffix="",
+    exposure_time=0.1,
+    exposure_period=None,
+    toggle_beam=True,
+    fit=None,
+    background=None,
+    md={},
+    verbosity=3,
+):
+    """
+    Continuous-motion version of fit_scan. The motor is moved across the scan
+    range at constant velocity while the detector acquires a burst of
+    exposures (multi-image mode, as in series_measure). The intensity of each
+    frame is recorded by the time series of the stats plugin (so that frames
+    with identical values are all kept), and is paired with the motor position
+    interpolated (from the readback timestamps) at the middle of that frame's
+    exposure. The frames are hardware-timed (one every exposure_period); their
+    timing is anchored on the updates of the detector's frame counter.
+
+    Parameters
+    ----------
+    motor : motor
+        The axis/stage/motor that you want to move (e.g. smy or sth).
+    span : float
+        The total size of the scan range (centered about the current position).
+        If a two-element list is instead specified, this is interpreted as the
+        distances relative to the current position for the start and end.
+    num : int
+        The number of frames (scan points).
+    exposure_time : float
+        The exposure time of each frame.
+    exposure_period : float, optional
+        The time between frames (defaults to exposure_time + 0.05).
+    fit : None or string
+        If None, then fitting is not done. Otherwise, the model or statistic
+        (as in fit_scan) is applied to the frames.
+    background : None or string
+        A baseline/background underlying the fit function (as in fit_scan).
+    md : dict, optional
+        metadata
+
+    Returns
+    -------
+    The fit result (as in fit_scan), or if fit is None, a dict of the frame
+    positions and values.
+    """
+
+    # Don't modify the caller's dict (or the shared default)
+    md = dict(md)
+
+    if exposure_period is None:
+        exposure_period = exposure_time + 0.05
+
+    if toggle_beam:
+        beam.on()
+
+    if not beam.is_on():
+        print("WARNING: Experimental shutter is not open.")
+
+    initial_position = motor.user_readback.value
+
+    if type(span) is list:
+        start = initial_position + span[0]
+        stop = initial_position + span[1]
+    else:
+        start = initial_position - span / 2.0
+        stop = initial_position + span / 2.0
+
+    if detectors is None:
+        detectors = get_beamline().detector
+        plot_y = get_beamline().PLOT_Y
+    else:
+        plot_y = "{}{}".format(detectors[0].name, detector_suffix)
+    detector = detectors[0]
+
+    # The stats plugin (e.g. pilatus2M.stats4) whose total is plotted
+    signal = None
+    for walk in detector.walk_signals():
+        if walk.item.name == plot_y:
+            signal = walk.item
+            break
+    if signal is None:
+        print("ERROR: Detector {} has no signal {}.".format(detector.name, plot_y))
+        return
+    stats = signal.parent
+    if not hasattr(stats, "ts_total"):
+        print("ERROR: Signal {} does not come from a stats plugin with a time series.".format(plot_y))
+        return
+    ts_control = getattr(stats, "ts_control", None)
+    if ts_control is None:
+        ts_control = EpicsSignal(stats.prefix + "TS:TSControl", name=stats.name + "_ts_control", string=True)
+
+    # Move at a velocity such that the burst covers the scan range
+    duration = num * exposure_period
+    velocity = abs(stop - start) / duration
+    velocity_original = motor.velocity.get()
+
+    frames = []
+    readbacks = []
+
+    def frame_cb(value=None, timestamp=None, **kwargs):
+        # The frame counter changes with every frame (unlike the stats total)
+        frames.append((timestamp, value))
+
+    def readback_cb(value=None, timestamp=None, **kwargs):
+        readbacks.append((timestamp, value))
+
+    md["plan_header_override"] = "fly_scan"
+    md["scan"] = "fly_scan"
+    md["measure_type"] = "fly_scan_{}".format(motor.name)
+    md["fit_function"] = fit
+    md["fit_background"] = background
+    md["fly_scan_start"] = start
+    md["fly_scan_stop"] = stop
+    md["fly_scan_num"] = num
+    md["fly_scan_velocity"] = velocity
+
+    @bpp.stage_decorator(list(detectors))
+    @bpp.run_decorator(md=md)
+    def fly_plan():
+        yield from bps.abs_set(motor, stop, group="fly_scan_motion")
+        yield from bps.trigger_and_read(list(detectors) + [motor])
+        yield from bps.wait(group="fly_scan_motion")
+
+    for detector_i in detectors:
+        RE(detector_i.setExposureTime(exposure_time))
+        RE(detector_i.setExposurePeriod(exposure_period))
+        RE(detector_i.setExposureNumber(num))
+
+    motor.move(start)
+    motor.velocity.put(velocity)
+
+    stats.ts_num_points.put(num)
+    ts_control.put("Erase/Start", wait=True)
+    counter_start = detector.cam.array_counter.get()
+
+    start_time = time.time()
+    frame_cid = detector.cam.array_counter.subscribe(frame_cb, run=False)
+    readback_cid = motor.user_readback.subscribe(readback_cb, run=True)
+    try:
+        RE(fly_plan())
+    finally:
+        detector.cam.array_counter.unsubscribe(frame_cid)
+        motor.user_readback.unsubscribe(readback_cid)
+        motor.velocity.put(velocity_original)
+        for detector_i in detectors:
+            RE(detector_i.setExposureNumber(1))
+
+        # Let the stats plugin catch up with the last frames, then read its time series
+        num_frames = detector.cam.array_counter.get() - counter_start
+        deadline = time.time() + 5.0
+        while stats.ts_current_point.get() < num_frames and time.time() < deadline:
+            time.sleep(0.05)
+        ts_control.put("Stop", wait=True)
+        stats.ts_read.put(1, wait=True)
+
+    if toggle_beam:
+        beam.off()
+
+    if plot_y == "pilatus2M_stats4_total" or plot_y == "pilatus2M_stats3_total":
+        remove_last_Pilatus_series()
+
+    ys = np.asarray(stats.ts_total.get(), dtype=float)[: stats.ts_current_point.get()]
+
+    # Frame k (counting from 1) is delivered at the end of its exposure period.
+    # The frames are evenly spaced, so the time of the first one is estimated
+    # from all the counter updates that were received, and frame k is exposed
+    # from t_first + (k - 1) * exposure_period for exposure_time.
+    if len(frames) > 0:
+        frame_times, counters = np.asarray(frames, dtype=float).reshape(-1, 2).T
+        t_first = np.mean(frame_times - (counters - counter_start - 1) * exposure_period) - exposure_period
+    else:
+        t_first = start_time
+    frame_mid_times = t_first + np.arange(len(ys)) * exposure_period + exposure_time * 0.5
+    readback_times, readback_values = np.asarray(sorted(readbacks), dtype=float).reshape(-1, 2).T
+    xs = np.interp(frame_mid_times, readback_times, readback_values)
+
+    if verbosity >= 3:
+        print(
+            "  fly_scan: {:d} frames (of {:d}) over {} = [{:.3f}, {:.3f}] in {:.1f} s".format(
+                len(ys), num, motor.name, start, stop, time.time() - start_time
+            )
+        )
+
+    if len(ys) != num:
+        print("ERROR: {:d} frames were recorded (of {:d}); the data is incomplete.".format(len(ys), num))
+        motor.move(initial_position)
+        return {"x": xs, "y": ys}
+
+    if fit is None or len(ys) < 3:
+        if fit is not None:
+            print("WARNING: Too few frames ({}) were recorded to fit.".format(len(ys)))
+        motor.move(initial_position)
+        return {"x": xs, "y": ys}
+
+    if fit in ["max", "min", "COM", "HM", "HMi"] or type(fit) is list:
+        livefit = LiveStat.from_table({motor.name: xs, plot_y: ys}, fit, plot_y, motor.name)
+
+    else:
+        livefit = LiveFit_Custom(
+            fit,
+            plot_y,
+            {"x": motor.name},
+            scan_range=[start, stop],
+            background=background,
+        )
+        livefit.independent_vars_data["x"] = list(xs)
+        livefit.ydata = list(ys)
+        livefit.update_fit()
+
+    print(livefit.result.values)
+    x0 = livefit.result.values["x0"]
+    motor.move(x0)
+    return livefit.result
+
+
+def _fit_run(job):
+    """Fit the (x,y) data of one run, for fit_past_scans."""
+
+    row = {k: job[k] for k in ["uid", "scan_id", "time", "fit"]}
+    row["num_points"] = len(job["x"])
+    try:
+        fit = job["fit"]
+        if fit in ["max", "min", "COM", "HM", "HMi"] or type(fit) is list:
+            livefit = LiveStat.from_table({"x": job["x"], "y": job["y"]}, fit, "y", "x")
+            values = livefit.result.values
+        else:
+            livefit = LiveFit_Custom(
+                fit,
+                "y",
+                {"x": "x"},
+                scan_range=[np.min(job["x"]), np.max(job["x"])],
+                update_every=None,
+                background=job["background"],
+            )
+            livefit.independent_vars_data["x"] = list(job["x"])
+            livefit.ydata = list(job["y"])
+            livefit.update_fit()
+            values = livefit.result.values
+            row["success"] = livefit.result.success
+            row["redchi"] = livefit.result.redchi
+
+        row["x0"] = values["x0"]
+        for width in ["sigma", "gamma", "fwhm"]:
+            if width in values:
+                row["width"] = values[width]
+                row["width_name"] = width
+                break
+        row.update({"fit_{}".format(k): v for k, v in values.items()})
+
+    except Exception as e:
+        row["error"] = str(e)
+
+    return row
+
+
+def fit_past_scans(
+    uids=None,
+    query=None,
+    fit=None,
+    background=None,
+    x_name=None,
+    y_name=None,
+    max_workers=None,
+    verbosity=3,
+):
+    """
+    Fit the data of past scans (e.g. the alignment scans of a whole cycle),
+    to follow the drift of beam/alignment positions without replaying each
+    run through a live fit.
+
+    The x/y columns of the runs are loaded from databroker (concurrently), and
+    the fits are done in a pool of threads, using the same models as
+    fit_scan (gauss, lorentz, sigmoid, erf, step, ..., as well as the
+    statistics max, min, COM, HM).
+
+    Parameters
+    ----------
+    uids : list of str, optional
+        The runs to fit.
+    query : dict, optional
+        A databroker query (e.g. {'measure_type': 'fit_scan_smy'}), used if
+        uids is not given.
+    fit : str, optional
+        The model to fit. By default, the one used during the scan (from the
+        metadata) is used again, along with its background.
+    background : str or list, optional
+        The background (if fit is given).
+    x_name, y_name : str, optional
+        The columns to fit. By default, the ones recorded by fit_scan in the
+        metadata (for older runs: the scanned motor and the plotted detector).
+    max_workers : int, optional
+        Number of threads to use for the fits.
+
+    Returns
+    -------
+    DataFrame with one row per run: uid, scan_id, time, fit, num_points, x0,
+    width (with width_name: sigma, gamma or fwhm), and all the fit parameters
+    (as fit_<name>). Runs that could not be fit have an 'error'.
+    """
+
+    if uids is not None:
+        headers = [db[uid] for uid in uids]
+    elif query is not None:
+        headers = list(db(**query))
+    else:
+        print("ERROR: Specify the runs to fit (uids or query).")
+        return None
+
+    def load(header):
+        start = header.start
+        job = {
+            "uid": start["uid"],
+            "scan_id": start.get("scan_id"),
+            "time": start.get("time"),
+            "fit": fit if fit is not None else start.get("fit_function"),
+            "background": background if fit is not None else start.get("fit_background"),
+        }
+        x = x_name if x_name is not None else start.get("fit_x", (start.get("motors") or [None])[0])
+        y = y_name if y_name is not None else start.get("fit_y", start.get("plot_y"))
+        table = header.table()
+        if y is None and len(start.get("detectors", [])) > 0:
+            y = "{}_stats4_total".format(start["detectors"][0])
+        if x not in table or y not in table:
+            job["error"] = "Columns {} and {} not found".format(x, y)
+            job["x"], job["y"] = np.zeros(0), np.zeros(0)
+        else:
+            job["x"], job["y"] = table[x].to_numpy(dtype=float), table[y].to_numpy(dtype=float)
+        return job
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        jobs = list(executor.map(load, headers))
+
+    if verbosity >= 3:
+        print("Fitting {:d} runs".format(len(jobs)))
+
+    to_fit = [job for job in jobs if "error" not in job and job["fit"] is not None and len(job["x"]) >= 3]
+    # Threads rather than processes: the models are defined in this session's namespace (not importable by
+    # spawned workers), and forking a session with live EPICS/RunEngine threads is not safe
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fitted = dict(zip([job["uid"] for job in to_fit], executor.map(_fit_run, to_fit)))
+
+    rows = []
+    for job in jobs:
+        if job["uid"] in fitted:
+            rows.append(fitted[job["uid"]])
+        else:
+            row = {k: job[k] for k in ["uid", "scan_id", "time", "fit"]}
+            row["num_points"] = len(job["x"])
+            row["error"] = job.get("error", "Nothing to fit")
+            rows.append(row)
+
+    results = pds.DataFrame(rows)
+    if verbosity >= 3:
+        num_errors = int(results["error"].notna().sum()) if "error" in results else 0
+        print("  {:d} runs fit ({:d} failed)".format(len(results) - num_errors, num_errors))
+
+    return results
+
+
 def fit_edge(
     motor,
     span,
@@ -1122,24 +1871,9 @@ def fit_edge(
     # (gives a list)
     subs.append(livetable)
 
-    if plot:
+    if plot and not fit_figures.headless:
         # Get axes for plotting
-        title = "fit_scan: {} vs. {}".format(detectors[0].name, motor.name)
-        fig = None
-        for i in plt.get_fignums():
-            title_cur = plt.figure(i).canvas.manager.window.windowTitle()
-            if title_cur == title:
-                fig = plt.figure(i)
-                break
-
-        if fig is None:
-            # New figure
-            # fig, ax = plt.subplots()
-            fig = plt.figure(figsize=(11, 7), facecolor="white")
-            fig.canvas.manager.toolbar.pan()
-
-        fig.canvas.manager.set_window_title(title)
-        ax = fig.gca()
+        ax = fit_figures.get_axes(detectors[0].name, motor.name)
 
         liveplot = LivePlot_Custom(plot_y, motor.name, ax=ax)
         # liveplot = LivePlot(plot_y, motor.name, ax=ax)
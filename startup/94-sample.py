@@ -30,6 +30,23 @@ import pandas as pds
 from datetime import datetime
 import functools
 import hashlib
+from contextlib import contextmanager
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ophyd.status import SubscriptionStatus
+from ophyd.utils import WaitTimeoutError
+from ophyd.utils.errors import StatusTimeoutError
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+
+# Temperature probes, read together when collecting metadata (see Sample_Generic.get_md)
+pv_snapshot.register("temperature", ["XF:11BM-ES{{Env:01-Chan:{}}}T:C-I".format(probe) for probe in "ABCD"])
 
 
 class CoordinateSystem(object):
@@ -738,42 +755,79 @@ class Axis(object):
         current_position = self.get_position(verbosity=0)
         self.origin = self.get_origin() + (current_position - new_position) * self.scaling
 
-    def search(
+    def _search_motor(self):
+        """Return the underlying motor that physically moves this axis."""
+
+        if self.motor is not None:
+            return self.motor
+
+        return self.base_stage._axes[self.name]._search_motor()
+
+    def search_engine(
         self,
+        motor=None,
         step_size=1.0,
         min_step=0.05,
         intensity=None,
+        maxInt=None,
         target=0.5,
         detector=None,
         detector_suffix=None,
         polarity=+1,
+        fastsearch=False,
+        mode="bisect",
+        fit_model="erf",
+        max_probes=20,
         verbosity=3,
     ):
-        """Moves this axis, searching for a target value.
+        """Plan that moves this axis, searching for a target value.
+
+        All the probes of the search are taken inside a single run (one
+        trigger_and_read per probe), which avoids paying the run start/stop
+        overhead of a full RE(count()) for every step. A summary of the search
+        (number of probes, wall time, best position) is stored in
+        self.last_search.
 
         Parameters
         ----------
+        motor : motor, optional
+            The motor to move. If None, the motor underlying this axis is
+            used, and step sizes are given in this axis' coordinate system.
+            If a motor is given, step sizes are in the motor's units.
         step_size : float
             The initial step size when moving the axis
         min_step : float
             The final (minimum) step size to try
         intensity : float
             The expected full-beam intensity readout
+        maxInt : float, optional
+            If provided, the alignment is flagged as failed (self.align_success)
+            when the readout is within 10% of this (saturation) value.
         target : 0.0 to 1.0
             The target ratio of full-beam intensity; 0.5 searches for half-max.
-            The target can also be 'max' to find a local maximum.
+            The target can also be 'max' or 'min' to find a local extremum.
         detector, detector_suffix
             The beamline detector (and suffix, such as '_stats4_total') to trigger to measure intensity
         polarity : +1 or -1
             Positive motion assumes, e.g. a step-height 'up' (as the axis goes more positive)
+        fastsearch : bool
+            If True, stop immediately when the reflected beam is already found
+            in stats2 of the detector.
+        mode : 'bisect' or 'fit'
+            'bisect' halves the step size each time the target is overshot.
+            'fit' (only for a numerical target) first brackets the target, then
+            fits an edge model to all the probes taken so far and jumps
+            directly to the predicted crossing; it stops once the uncertainty
+            of the fitted position is below min_step (and the prediction agrees
+            with the current position to within min_step).
+        fit_model : string
+            The edge model (from LiveFit_Custom.get_model) used in 'fit' mode,
+            e.g. 'erf', 'sigmoid' or 'tanh'. The reversed ('_r') variant is used
+            for negative polarity.
+        max_probes : int
+            The maximum number of probes taken in 'fit' mode.
         """
 
-        if not get_beamline().beam.is_on():
-            print("WARNING: Experimental shutter is not open.")
-
-        if intensity is None:
-            intensity = RE.md["beam_intensity_expected"]
-
         if detector is None:
             # detector = gs.DETS[0]
             detector = get_beamline().detector[0]
@@ -783,131 +837,288 @@ class Axis(object):
         else:
             value_name = detector.name + detector_suffix
 
-        bec.disable_table()
+        if motor is None:
+            motor = self._search_motor()
+            # Convert axis-coordinate steps into motor steps
+            step_scale = self.cur_to_motor(1.0) - self.cur_to_motor(0.0)
+            to_position = self.motor_to_cur
+        else:
+            step_scale = 1.0
+            to_position = lambda motor_position: motor_position
+
+        md = {
+            "plan_name": "search",
+            "search_axis": self.name,
+            "search_motor": motor.name,
+            "search_target": str(target),
+            "search_mode": mode,
+        }
 
-        # Check current value
-        RE(count([detector]))
-        value = detector.read()[value_name]["value"]
+        @bpp.stage_decorator([detector])
+        @bpp.run_decorator(md=md)
+        def inner_search():
+            nonlocal intensity, target, step_size
 
-        if target == "max":
-            if verbosity >= 5:
-                print("Performing search on axis '{}' target is 'max'".format(self.name))
+            if not get_beamline().beam.is_on():
+                print("WARNING: Experimental shutter is not open.")
+
+            if intensity is None:
+                intensity = RE.md["beam_intensity_expected"]
 
-            max_value = value
-            max_position = self.get_position(verbosity=0)
+            start_time = time.time()
+            probes = []
 
-            direction = +1 * polarity
+            def probe():
+                reading = yield from bps.trigger_and_read([detector, motor])
+                value = reading[value_name]["value"]
+                position = to_position(reading[motor.name]["value"])
+                probes.append((position, value))
 
-            while step_size >= min_step:
-                if verbosity >= 4:
-                    print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
+                if maxInt is not None:
+                    self.align_success = not (abs(maxInt - value) / maxInt < 0.1)
 
-                prev_value = value
-                RE(count([detector]))
+                return value
 
-                value = detector.read()[value_name]["value"]
-                if verbosity >= 3:
+            # Check current value
+            value = yield from probe()
+
+            if fastsearch:
+                intenisty_threshold = 10
+                if (
+                    abs(detector.stats2.max_xy.get().y - detector.stats2.centroid.get().y) < 20
+                    and detector.stats2.max_value.get() > intenisty_threshold
+                ):
+                    # continue the fast alignment
+                    print("The reflective beam is found! Continue the fast alignment")
+                    step_size = 0
+
+            if target == "max" or target == "min":
+                if verbosity >= 5:
+                    print("Performing search on axis '{}' target is '{}'".format(self.name, target))
+
+                direction = +1 * polarity
+
+            else:
+                target_rel = target
+                target = target_rel * intensity
+
+                if verbosity >= 5:
                     print(
-                        "      {} = {:.3f} {}; value : {}".format(
-                            self.name, self.get_position(verbosity=0), self.units, value
+                        "Performing search on axis '{}' target {} × {} = {}".format(
+                            self.name, target_rel, intensity, target
                         )
                     )
+                if verbosity >= 4:
+                    print("      value : {} ({:.1f}%)".format(value, 100.0 * value / intensity))
 
-                if value > max_value:
-                    max_value = value
-                    max_position = self.get_position(verbosity=0)
-
-                if value > prev_value:
-                    # Keep going in this direction...
-                    pass
+                # Determine initial motion direction
+                if value > target:
+                    direction = -1 * polarity
                 else:
-                    # Switch directions!
-                    direction *= -1
-                    step_size *= 0.5
+                    direction = +1 * polarity
 
-        elif target == "min":
-            if verbosity >= 5:
-                print("Performing search on axis '{}' target is 'min'".format(self.name))
+            if mode == "fit" and target != "max" and target != "min":
+                model_name = fit_model if polarity > 0 else "{}_r".format(fit_model)
+
+                # Step towards the target until it is bracketed by the probes
+                while step_size > 0 and not self._search_bracketed(probes, target):
+                    if len(probes) >= max_probes:
+                        print("WARNING: Could not bracket the target on axis '{}'.".format(self.name))
+                        break
+                    if verbosity >= 4:
+                        print("        move {} by {} × {}".format(self.name, direction, step_size))
+                    yield from bps.mvr(motor, direction * step_size * step_scale)
+                    value = yield from probe()
+
+                # Jump to the crossing predicted by the fit of all the probes, until
+                # the prediction is precise and agrees with the current position
+                while step_size > 0 and self._search_bracketed(probes, target) and len(probes) < max_probes:
+                    x_pred, uncertainty = self._search_fit_predict(probes, target, intensity, model_name)
+                    if verbosity >= 4:
+                        print("        fit predicts {} = {:.4f} ± {:.4f}".format(self.name, x_pred, uncertainty))
+
+                    if uncertainty < min_step and abs(x_pred - probes[-1][0]) < min_step:
+                        break
+
+                    yield from bps.mvr(motor, (x_pred - probes[-1][0]) * step_scale)
+                    value = yield from probe()
+
+                    if verbosity >= 3:
+                        print(
+                            "      {} = {:.3f} {}; value : {} ({:.1f}%)".format(
+                                self.name, probes[-1][0], self.units, value, 100.0 * value / intensity
+                            )
+                        )
 
-            direction = +1 * polarity
+                step_size = 0
 
             while step_size >= min_step:
                 if verbosity >= 4:
                     print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
+                yield from bps.mvr(motor, direction * step_size * step_scale)
 
                 prev_value = value
-                RE(count([detector]))
-                value = detector.read()[value_name]["value"]
+                value = yield from probe()
+
                 if verbosity >= 3:
-                    print(
-                        "      {} = {:.3f} {}; value : {}".format(
-                            self.name, self.get_position(verbosity=0), self.units, value
+                    position = probes[-1][0]
+                    if target == "max" or target == "min":
+                        print("      {} = {:.3f} {}; value : {}".format(self.name, position, self.units, value))
+                    else:
+                        print(
+                            "      {} = {:.3f} {}; value : {} ({:.1f}%)".format(
+                                self.name, position, self.units, value, 100.0 * value / intensity
+                            )
                         )
-                    )
 
-                if value < prev_value:
-                    # Keep going in this direction...
-                    pass
+                if target == "max":
+                    keep_going = value > prev_value
+                elif target == "min":
+                    keep_going = value < prev_value
                 else:
+                    new_direction = -1.0 * polarity if value > target else +1.0 * polarity
+                    keep_going = abs(direction - new_direction) < 1e-4
+
+                if not keep_going:
                     # Switch directions!
                     direction *= -1
                     step_size *= 0.5
 
-        else:
-            target_rel = target
-            target = target_rel * intensity
+            positions, values = zip(*probes)
+            if target == "min":
+                best = int(np.argmin(values))
+            else:
+                best = int(np.argmax(values))
+
+            self.last_search = {
+                "axis": self.name,
+                "target": target,
+                "mode": mode,
+                "probes": len(probes),
+                "elapsed": time.time() - start_time,
+                "position": positions[-1],
+                "value": values[-1],
+                "best_position": positions[best],
+                "best_value": values[best],
+                "positions": list(positions),
+                "values": list(values),
+            }
 
-            if verbosity >= 5:
+            if verbosity >= 3:
                 print(
-                    "Performing search on axis '{}' target {} × {} = {}".format(
-                        self.name, target_rel, intensity, target
+                    "  Search on axis '{}' took {:d} probes in {:.1f} s".format(
+                        self.name, self.last_search["probes"], self.last_search["elapsed"]
                     )
                 )
-            if verbosity >= 4:
-                print("      value : {} ({:.1f}%)".format(value, 100.0 * value / intensity))
 
-            # Determine initial motion direction
-            if value > target:
-                direction = -1 * polarity
-            else:
-                direction = +1 * polarity
+            return self.last_search
+
+        return (yield from inner_search())
+
+    def _search_bracketed(self, probes, target):
+        """Whether the probes taken so far lie on both sides of the target value."""
+
+        values = [value for position, value in probes]
+        return min(values) <= target <= max(values)
+
+    def _search_fit_predict(self, probes, target, intensity, model_name="erf"):
+        """Fit an edge model to the (position, value) probes and return the
+        predicted position where the edge crosses the target value, along with
+        the uncertainty of that prediction."""
+
+        positions, values = np.asarray(probes, dtype=float).T
+        order = np.argsort(positions)
+        xs, ys = positions[order], values[order]
+
+        # Linear interpolation between the probes that bracket the target
+        above = ys > target
+        crossings = np.where(above[1:] != above[:-1])[0]
+        if len(crossings) < 1:
+            idx = int(np.argmin(np.abs(ys - target)))
+            return xs[idx], np.inf
+        # Use the crossing closest to the most recent probe
+        i = crossings[np.argmin(np.abs(xs[crossings] - probes[-1][0]))]
+        x_lo, x_hi = xs[i], xs[i + 1]
+        x_lin = x_lo + (target - ys[i]) * (x_hi - x_lo) / (ys[i + 1] - ys[i])
+
+        span = xs[-1] - xs[0]
+        lm_model = LiveFit_Custom.get_model(model_name)
+        params = lm_model.make_params(x0=x_lin, prefactor=max(intensity, ys.max()), sigma=(x_hi - x_lo) * 0.5)
+        params["x0"].set(min=xs[0], max=xs[-1])
+        params["sigma"].set(min=span * 1e-4, max=span * 4)
+        # The full-beam intensity is known; only fit it once there are enough probes
+        params["prefactor"].set(min=0, vary=len(probes) > 4)
+
+        try:
+            result = lm_model.fit(ys, params, x=xs)
+        except Exception as ex:
+            print("WARNING: Edge fit failed ({}); using linear interpolation.".format(ex))
+            return x_lin, x_hi - x_lo
+
+        # Solve model(x) = target within the bracket
+        grid = np.linspace(x_lo, x_hi, num=1001)
+        x_pred = grid[np.argmin(np.abs(result.eval(x=grid) - target))]
+
+        stderr = result.params["x0"].stderr
+        if stderr is None or not np.isfinite(stderr):
+            uncertainty = x_hi - x_lo
+        else:
+            uncertainty = min(stderr, x_hi - x_lo)
 
-            while step_size >= min_step:
-                if verbosity >= 4:
-                    print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
+        return x_pred, uncertainty
 
-                RE(count([detector]))
-                value = detector.read()[value_name]["value"]
-                if verbosity >= 3:
-                    print(
-                        "      {} = {:.3f} {}; value : {} ({:.1f}%)".format(
-                            self.name,
-                            self.get_position(verbosity=0),
-                            self.units,
-                            value,
-                            100.0 * value / intensity,
-                        )
-                    )
+    def search(
+        self,
+        step_size=1.0,
+        min_step=0.05,
+        intensity=None,
+        target=0.5,
+        detector=None,
+        detector_suffix=None,
+        polarity=+1,
+        mode="bisect",
+        verbosity=3,
+    ):
+        """Moves this axis, searching for a target value.
 
-                # Determine direction
-                if value > target:
-                    new_direction = -1.0 * polarity
-                else:
-                    new_direction = +1.0 * polarity
+        Parameters
+        ----------
+        step_size : float
+            The initial step size when moving the axis
+        min_step : float
+            The final (minimum) step size to try
+        intensity : float
+            The expected full-beam intensity readout
+        target : 0.0 to 1.0
+            The target ratio of full-beam intensity; 0.5 searches for half-max.
+            The target can also be 'max' to find a local maximum.
+        detector, detector_suffix
+            The beamline detector (and suffix, such as '_stats4_total') to trigger to measure intensity
+        polarity : +1 or -1
+            Positive motion assumes, e.g. a step-height 'up' (as the axis goes more positive)
+        mode : 'bisect' or 'fit'
+            The search strategy (see search_engine).
+        """
 
-                if abs(direction - new_direction) < 1e-4:
-                    # Same direction as we've been going...
-                    # ...keep moving this way
-                    pass
-                else:
-                    # Switch directions!
-                    direction *= -1
-                    step_size *= 0.5
+        bec.disable_table()
+        try:
+            RE(
+                self.search_engine(
+                    step_size=step_size,
+                    min_step=min_step,
+                    intensity=intensity,
+                    target=target,
+                    detector=detector,
+                    detector_suffix=detector_suffix,
+                    polarity=polarity,
+                    mode=mode,
+                    verbosity=verbosity,
+                )
+            )
+        finally:
+            bec.enable_table()
 
-        bec.enable_table()
+        return self.last_search
 
     def search_plan(
         self,
@@ -920,6 +1131,7 @@ class Axis(object):
         detector_suffix=None,
         polarity=+1,
         fastsearch=False,
+        mode="bisect",
         verbosity=3,
     ):
         """Moves this axis, searching for a target value.
@@ -939,180 +1151,25 @@ class Axis(object):
             The beamline detector (and suffix, such as '_stats4_total') to trigger to measure intensity
         polarity : +1 or -1
             Positive motion assumes, e.g. a step-height 'up' (as the axis goes more positive)
+        mode : 'bisect' or 'fit'
+            The search strategy (see search_engine).
         """
 
-        @stage_decorator([detector])
-        def inner_search():
-            if not get_beamline().beam.is_on():
-                print("WARNING: Experimental shutter is not open.")
-
-            if intensity is None:
-                intensity = RE.md["beam_intensity_expected"]
-
-            if detector is None:
-                # detector = gs.DETS[0]
-                detector = get_beamline().detector[0]
-            if detector_suffix is None:
-                # value_name = gs.TABLE_COLS[0]
-                value_name = get_beamline().TABLE_COLS[0]
-            else:
-                value_name = detector.name + detector_suffix
-
-            bec.disable_table()
-
-            # Check current value
-            yield from bps.trigger_and_read([detector])
-            # RE(count([detector]))
-            value = detector.read()[value_name]["value"]
-
-            if fastsearch == True:
-                intenisty_threshold = 10
-                if (
-                    abs(detector.stats2.max_xy.get().y - detector.stats2.centroid.get().y) < 20
-                    and detector.stats2.max_value.get() > intenisty_threshold
-                ):
-                    # continue the fast alignment
-                    print("The reflective beam is found! Continue the fast alignment")
-                    return
-
-            if target == "max":
-                if verbosity >= 5:
-                    print("Performing search on axis '{}' target is 'max'".format(self.name))
-
-                max_value = value
-                max_position = self.get_position(verbosity=0)
-
-                direction = +1 * polarity
-
-                while step_size >= min_step:
-                    if verbosity >= 4:
-                        print("        move {} by {} × {}".format(self.name, direction, step_size))
-
-                    pos = yield from bps.rd(motor)
-                    yield from bps.mv(motor, pos + direction * step_size)
-                    # self.move_relative(move_amount=direction*step_size, verbosity=verbosity-2)
-
-                    prev_value = value
-                    yield from bps.trigger_and_read([detector])
-                    # RE(count([detector]))
-
-                    value = detector.read()[value_name]["value"]
-                    if verbosity >= 3:
-                        print(
-                            "      {} = {:.3f} {}; value : {}".format(
-                                self.name,
-                                self.get_position(verbosity=0),
-                                self.units,
-                                value,
-                            )
-                        )
-
-                    if value > max_value:
-                        max_value = value
-                        # max_position = self.get_position(verbosity=0)
-
-                    if value > prev_value:
-                        # Keep going in this direction...
-                        pass
-                    else:
-                        # Switch directions!
-                        direction *= -1
-                        step_size *= 0.5
-
-            elif target == "min":
-                if verbosity >= 5:
-                    print("Performing search on axis '{}' target is 'min'".format(self.name))
-
-                direction = +1 * polarity
-
-                while step_size >= min_step:
-                    if verbosity >= 4:
-                        print("        move {} by {} × {}".format(self.name, direction, step_size))
-
-                    pos = yield from bps.rd(motor)
-                    yield from bps.mv(motor, pos + direction * step_size)
-                    # self.move_relative(move_amount=direction*step_size, verbosity=verbosity-2)
-
-                    prev_value = value
-                    RE(count([detector]))
-                    value = detector.read()[value_name]["value"]
-                    if verbosity >= 3:
-                        print(
-                            "      {} = {:.3f} {}; value : {}".format(
-                                self.name,
-                                self.get_position(verbosity=0),
-                                self.units,
-                                value,
-                            )
-                        )
-
-                    if value < prev_value:
-                        # Keep going in this direction...
-                        pass
-                    else:
-                        # Switch directions!
-                        direction *= -1
-                        step_size *= 0.5
-
-            else:
-                target_rel = target
-                target = target_rel * intensity
-
-                if verbosity >= 5:
-                    print(
-                        "Performing search on axis '{}' target {} × {} = {}".format(
-                            self.name, target_rel, intensity, target
-                        )
-                    )
-                if verbosity >= 4:
-                    print("      value : {} ({:.1f}%)".format(value, 100.0 * value / intensity))
-
-                # Determine initial motion direction
-                if value > target:
-                    direction = -1 * polarity
-                else:
-                    direction = +1 * polarity
-
-                while step_size >= min_step:
-                    if verbosity >= 4:
-                        print("        move {} by {} × {}".format(self.name, direction, step_size))
-
-                    pos = yield from bps.rd(motor)
-                    yield from bps.mv(motor, pos + direction * step_size)
-                    # self.move_relative(move_amount=direction*step_size, verbosity=verbosity-2)
-
-                    yield from bps.trigger_and_read([detector])
-                    # RE(count([detector]))
-                    value = detector.read()[value_name]["value"]
-                    if verbosity >= 3:
-                        print(
-                            "      {} = {:.3f} {}; value : {} ({:.1f}%)".format(
-                                self.name,
-                                self.get_position(verbosity=0),
-                                self.units,
-                                value,
-                                100.0 * value / intensity,
-                            )
-                        )
-
-                    # Determine direction
-                    if value > target:
-                        new_direction = -1.0 * polarity
-                    else:
-                        new_direction = +1.0 * polarity
-
-                    if abs(direction - new_direction) < 1e-4:
-                        # Same direction as we've been going...
-                        # ...keep moving this way
-                        pass
-                    else:
-                        # Switch directions!
-                        direction *= -1
-                        step_size *= 0.5
-
-            bec.enable_table()
-
-        yield from inner_search()
+        return (
+            yield from self.search_engine(
+                motor=motor,
+                step_size=step_size,
+                min_step=min_step,
+                intensity=intensity,
+                target=target,
+                detector=detector,
+                detector_suffix=detector_suffix,
+                polarity=polarity,
+                fastsearch=fastsearch,
+                mode=mode,
+                verbosity=verbosity,
+            )
+        )
 
     def _search(
         self,
@@ -1124,6 +1181,7 @@ class Axis(object):
         detector=None,
         detector_suffix=None,
         polarity=+1,
+        mode="bisect",
         verbosity=3,
     ):
         """Moves this axis, searching for a target value.
@@ -1143,170 +1201,46 @@ class Axis(object):
             The beamline detector (and suffix, such as '_stats4_total') to trigger to measure intensity
         polarity : +1 or -1
             Positive motion assumes, e.g. a step-height 'up' (as the axis goes more positive)
+        mode : 'bisect' or 'fit'
+            The search strategy (see search_engine).
         """
 
-        if not get_beamline().beam.is_on():
-            print("WARNING: Experimental shutter is not open.")
-
-        if intensity is None:
-            intensity = RE.md["beam_intensity_expected"]
+        bec.disable_table()
+        try:
+            RE(
+                self.search_engine(
+                    step_size=step_size,
+                    min_step=min_step,
+                    intensity=intensity,
+                    maxInt=maxInt,
+                    target=target,
+                    detector=detector,
+                    detector_suffix=detector_suffix,
+                    polarity=polarity,
+                    mode=mode,
+                    verbosity=verbosity,
+                )
+            )
+        finally:
+            bec.enable_table()
 
-        if detector is None:
-            # detector = gs.DETS[0]
-            detector = get_beamline().detector[0]
-        if detector_suffix is None:
-            # value_name = gs.TABLE_COLS[0]
-            value_name = get_beamline().TABLE_COLS[0]
-        else:
-            value_name = detector.name + detector_suffix
+        return self.last_search
 
-        bec.disable_table()
+    def scan(self):
+        print("todo")
 
-        # Check current value
-        RE(count([detector]))
-        value = detector.read()[value_name]["value"]
+    def center(self):
+        print("todo")
 
-        if target == "max":
-            if verbosity >= 5:
-                print("Performing search on axis '{}' target is 'max'".format(self.name))
+    def mark(self, label, position=None, verbosity=3):
+        """Set a mark for this axis. (By default, the current position is
+        used.)"""
 
-            max_value = value
-            max_position = self.get_position(verbosity=0)
+        if position is None:
+            position = self.get_position(verbosity=0)
 
-            direction = +1 * polarity
-
-            while step_size >= min_step:
-                if verbosity >= 4:
-                    print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
-
-                prev_value = value
-                RE(count([detector]))
-
-                value = detector.read()[value_name]["value"]
-
-                if abs(maxInt - value) / maxInt < 0.1:
-                    self.align_success = False
-                else:
-                    self.align_success = True
-
-                if verbosity >= 3:
-                    print(
-                        "      {} = {:.3f} {}; value : {}".format(
-                            self.name, self.get_position(verbosity=0), self.units, value
-                        )
-                    )
-
-                if value > max_value:
-                    max_value = value
-                    max_position = self.get_position(verbosity=0)
-
-                if value > prev_value:
-                    # Keep going in this direction...
-                    pass
-                else:
-                    # Switch directions!
-                    direction *= -1
-                    step_size *= 0.5
-
-        elif target == "min":
-            if verbosity >= 5:
-                print("Performing search on axis '{}' target is 'min'".format(self.name))
-
-            direction = +1 * polarity
-
-            while step_size >= min_step:
-                if verbosity >= 4:
-                    print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
-
-                prev_value = value
-                RE(count([detector]))
-                value = detector.read()[value_name]["value"]
-                if verbosity >= 3:
-                    print(
-                        "      {} = {:.3f} {}; value : {}".format(
-                            self.name, self.get_position(verbosity=0), self.units, value
-                        )
-                    )
-
-                if value < prev_value:
-                    # Keep going in this direction...
-                    pass
-                else:
-                    # Switch directions!
-                    direction *= -1
-                    step_size *= 0.5
-
-        else:
-            target_rel = target
-            target = target_rel * intensity
-
-            if verbosity >= 5:
-                print(
-                    "Performing search on axis '{}' target {} × {} = {}".format(
-                        self.name, target_rel, intensity, target
-                    )
-                )
-            if verbosity >= 4:
-                print("      value : {} ({:.1f}%)".format(value, 100.0 * value / intensity))
-
-            # Determine initial motion direction
-            if value > target:
-                direction = -1 * polarity
-            else:
-                direction = +1 * polarity
-
-            while step_size >= min_step:
-                if verbosity >= 4:
-                    print("        move {} by {} × {}".format(self.name, direction, step_size))
-                self.move_relative(move_amount=direction * step_size, verbosity=verbosity - 2)
-
-                RE(count([detector]))
-                value = detector.read()[value_name]["value"]
-                if verbosity >= 3:
-                    print(
-                        "      {} = {:.3f} {}; value : {} ({:.1f}%)".format(
-                            self.name,
-                            self.get_position(verbosity=0),
-                            self.units,
-                            value,
-                            100.0 * value / intensity,
-                        )
-                    )
-
-                # Determine direction
-                if value > target:
-                    new_direction = -1.0 * polarity
-                else:
-                    new_direction = +1.0 * polarity
-
-                if abs(direction - new_direction) < 1e-4:
-                    # Same direction as we've been going...
-                    # ...keep moving this way
-                    pass
-                else:
-                    # Switch directions!
-                    direction *= -1
-                    step_size *= 0.5
-
-        bec.enable_table()
-
-    def scan(self):
-        print("todo")
-
-    def center(self):
-        print("todo")
-
-    def mark(self, label, position=None, verbosity=3):
-        """Set a mark for this axis. (By default, the current position is
-        used.)"""
-
-        if position is None:
-            position = self.get_position(verbosity=0)
-
-        axes_positions = {self.name: position}
-        self.stage.mark(label, **axes_positions)
+        axes_positions = {self.name: position}
+        self.stage.mark(label, **axes_positions)
 
     # Book-keeping
     ########################################
@@ -1354,6 +1288,366 @@ class Axis(object):
             print("Error: %s %s has 'base_stage' set to 'None'." % (self.__class__.__name__, self.name))
 
 
+def link_fileseries(source_template, link_template, num_frames, max_workers=16, verbosity=3):
+    """Create symlinks for all the frames of a detector file series.
+
+    The source directory is listed once to find which frames exist, and the
+    links are then created in parallel. Missing frames do not stop the linking
+    of the other frames; they are reported together at the end.
+
+    Parameters
+    ----------
+    source_template : str
+        Filename of the frames written by the detector, e.g. '/path/name_{:06d}.tiff'
+    link_template : str
+        Name of the links to create, e.g. '/alias/saxs/raw/sample_{:06d}_saxs.tiff'
+    num_frames : int
+        Number of frames in the series.
+
+    Returns
+    -------
+    links : list of (source, link_name) that were created
+    missing : list of frame numbers that were not found on disk
+    failed : list of (link_name, error) for links that could not be created
+    """
+
+    source_dir = os.path.dirname(source_template.format(0))
+    try:
+        present = set(os.listdir(source_dir))
+    except OSError:
+        present = set()
+
+    links, missing = [], []
+    for num_frame in range(num_frames):
+        source = source_template.format(num_frame)
+        if os.path.basename(source) in present:
+            links.append((source, link_template.format(num_frame)))
+        else:
+            missing.append(num_frame)
+
+    def make_link(link):
+        source, link_name = link
+        try:
+            os.symlink(source, link_name)
+        except OSError as e:
+            return link_name, e
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        failed = [result for result in executor.map(make_link, links) if result is not None]
+    if len(failed) > 0:
+        failed_names = set(link_name for link_name, e in failed)
+        links = [link for link in links if link[1] not in failed_names]
+
+    if verbosity >= 3 and len(links) > 0:
+        print("  Data {} linked as: {}".format(*links[0]))
+        if len(links) > 1:
+            print("  Data {} linked as: {}".format(*links[-1]))
+    if verbosity >= 2:
+        print("  Linked {:d}/{:d} frames".format(len(links), num_frames))
+    if verbosity >= 1:
+        if len(missing) > 0:
+            print(
+                "WARNING: {:d} frames do not exist (e.g. {}): {}".format(
+                    len(missing), source_template.format(missing[0]), missing
+                )
+            )
+        for link_name, e in failed:
+            print("WARNING: Could not create link {}: {}".format(link_name, e))
+
+    return links, missing, failed
+
+
+def link_file(filename, link_name):
+    """Symlink filename as link_name. An existing link_name is kept by renaming it to link_name.1, .2, etc."""
+    if os.path.isfile(link_name):
+        i = 1
+        while os.path.isfile("{}.{:d}".format(link_name, i)):
+            i += 1
+        os.rename(link_name, "{}.{:d}".format(link_name, i))
+    os.symlink(filename, link_name)
+
+
+class FileHandlingWorker(object):
+    """Background thread that links detector files into the experiment directory.
+
+    Jobs (detector name, filename, link_name) are handled in the order they
+    were submitted. Since the detector may still be writing when a job is
+    submitted, each job waits (up to timeout) for the file to appear on disk.
+    Failed jobs are collected in self.errors rather than raised, so that the
+    measurement loop is not interrupted; call flush() to wait for all pending
+    jobs and print a report of the errors.
+    """
+
+    def __init__(self, timeout=60.0, poling_period=0.2):
+        self.timeout = timeout
+        self.poling_period = poling_period
+        self.enabled = False
+        self.jobs = queue.Queue()
+        self.errors = []
+        self.completed = 0
+        self._lock = threading.Lock()  # protects errors and completed
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="FileHandlingWorker", daemon=True)
+            self._thread.start()
+
+    def submit(self, detector_name, filename, link_name, verbosity=3):
+        self.start()
+        self.jobs.put((detector_name, filename, link_name, verbosity))
+
+    def pending(self):
+        """Number of jobs not yet finished."""
+        return self.jobs.unfinished_tasks
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                self._handle(*job)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors.append((job[0], job[1], job[2], e))
+            finally:
+                self.jobs.task_done()
+
+    def _handle(self, detector_name, filename, link_name, verbosity=3):
+        start_time = time.time()
+        while not os.path.isfile(filename):
+            if time.time() - start_time > self.timeout:
+                raise FileNotFoundError("File does not exist after {:.1f} s: {}".format(self.timeout, filename))
+            time.sleep(self.poling_period)
+
+        link_file(filename, link_name)
+        if not os.path.isfile(os.readlink(link_name)):
+            raise ValueError("NO IMAGE OUTPUT.")
+
+        if verbosity >= 4:
+            print("  Data {} linked as: {}".format(filename, link_name))
+
+    def flush(self, timeout=None, verbosity=3):
+        """Wait until all submitted jobs are done, then report (and clear) the errors.
+
+        Returns the list of errors, as (detector_name, filename, link_name, exception)."""
+        start_time = time.time()
+        with self.jobs.all_tasks_done:
+            while self.jobs.unfinished_tasks > 0:
+                if timeout is None:
+                    self.jobs.all_tasks_done.wait()
+                else:
+                    remaining = timeout - (time.time() - start_time)
+                    if remaining <= 0:
+                        if verbosity >= 1:
+                            pending = self.jobs.unfinished_tasks
+                            print("WARNING: {:d} file handling jobs still pending.".format(pending))
+                        break
+                    self.jobs.all_tasks_done.wait(remaining)
+        return self.report(verbosity=verbosity)
+
+    def report(self, clear=True, verbosity=3):
+        """Print the failed jobs (optionally clearing the list)."""
+        with self._lock:
+            errors = self.errors
+            completed = self.completed
+            if clear:
+                self.errors = []
+                self.completed = 0
+        if verbosity >= 2:
+            print("  File handling: {:d} linked, {:d} failed".format(completed, len(errors)))
+        if verbosity >= 1:
+            for detector_name, filename, link_name, e in errors:
+                print(
+                    "WARNING: File handling failed for {} ({} --> {}): {}".format(
+                        detector_name, filename, link_name, e
+                    )
+                )
+        return errors
+
+
+file_handler = FileHandlingWorker()
+
+
+# Detector tiling
+########################################
+# Tiling moves the detectors by a fixed offset between exposures, so that the
+# gaps between detector modules can be filled in.
+
+TILING_OFFSET = 5.16  # mm
+
+# Tile positions for each tiling mode: (name, detector_position, (x step, y step)).
+# They are listed in the order they are measured; successive tiles differ by a
+# single detector move.
+TILING_POSITIONS = {
+    "ygaps": [("pos1", "lower", (0, 0)), ("pos2", "upper", (0, 1))],
+    "xygaps": [
+        ("pos1", "lower_left", (0, 0)),
+        ("pos2", "upper_left", (0, 1)),
+        ("pos4", "upper_right", (1, 1)),
+        ("pos3", "lower_right", (1, 0)),
+    ],
+}
+
+
+def plan_tiling(detectors, tiling, angles=None):
+    """Return the sequence of measurements for a tiled acquisition.
+
+    Every angle is measured at a tile before the detectors move to the next
+    tile, and the angles are swept in alternating directions, so that both
+    the (slow) detector moves and the theta travel are minimal.
+
+    Parameters
+    ----------
+    detectors : list
+        The active detectors (e.g. cms.detector).
+    tiling : str
+        'ygaps' or 'xygaps'
+    angles : list of float, optional
+        Incident angles to measure at each tile (None to not move theta).
+
+    Returns
+    -------
+    steps : list of dict
+        With keys 'tile', 'detector_position', 'angle' and 'targets' (a
+        dictionary {motor: position} for the detector stages).
+    origins : dict
+        The starting position of each detector stage motor {motor: position}.
+    """
+
+    origins = {}
+    directions = {}
+    for detector in detectors:
+        info = detector_registry.lookup(detector)
+        if info is None:
+            print("WARNING: Don't know how to tile detector '{}'.".format(detector.name))
+            continue
+        if info.tile_x is not None:
+            origins[info.tile_x] = info.tile_x.user_readback.value
+            directions[info.tile_x] = (info.tile_x_sign, 0)
+        if info.tile_y is not None:
+            origins[info.tile_y] = info.tile_y.user_readback.value
+            directions[info.tile_y] = (0, 1)
+
+    angles = [None] if angles is None else list(angles)
+
+    steps = []
+    for i, (tile, detector_position, (x_step, y_step)) in enumerate(TILING_POSITIONS[tiling]):
+        targets = {
+            motor: origin + TILING_OFFSET * (directions[motor][0] * x_step + directions[motor][1] * y_step)
+            for motor, origin in origins.items()
+        }
+        for angle in angles if i % 2 == 0 else angles[::-1]:
+            steps.append(
+                {"tile": tile, "detector_position": detector_position, "angle": angle, "targets": targets}
+            )
+
+    return steps, origins
+
+
+def _shifted_slices(n, shift):
+    """Slices (destination, source) such that destination[i] = source[i + shift] for length n."""
+    if shift >= 0:
+        return slice(0, n - shift), slice(shift, n)
+    return slice(-shift, n), slice(0, n + shift)
+
+
+def stitch_tiles(tiles, output_file=None, pixel_size=0.172, offset=TILING_OFFSET, x_sign=+1, verbosity=3):
+    """Combine the tiles of a tiled measurement into a single gap-free image.
+
+    The images are combined in the frame of the first tile. Pixels that are
+    invalid (negative, i.e. module gaps and bad pixels in Pilatus images) are
+    filled with the values from the other tiles, shifted according to the
+    detector move: moving the detector up by one offset shifts the pattern
+    down by offset/pixel_size pixels, and moving it right shifts the pattern
+    to the left. Detectors whose x motor moves the other way for a positive
+    x_step (tile_x_sign = -1 in the detector registry) shift to the right.
+
+    Parameters
+    ----------
+    tiles : list of (filename, (x_step, y_step))
+        The TIFF images (see TILING_POSITIONS for the steps); the first tile is
+        the reference.
+    output_file : str, optional
+        Where to write the combined image (as TIFF).
+    x_sign : +1 or -1
+        Direction of the detector x move for a positive x_step.
+
+    Returns
+    -------
+    combined : 2D array (pixels that could not be filled are -1)
+    """
+
+    if tifffile is None:
+        if verbosity >= 1:
+            print("WARNING: Stitching requires the 'tifffile' package.")
+        return None
+
+    shift = int(round(offset / pixel_size))
+
+    combined = None
+    for filename, (x_step, y_step) in tiles:
+        try:
+            image = tifffile.memmap(filename, mode="r")
+        except ValueError:
+            # Not memory-mappable (e.g. compressed); read it instead
+            image = tifffile.imread(filename)
+        if combined is None:
+            combined = np.where(image < 0, -1, image).astype(image.dtype)
+            continue
+
+        rows_dst, rows_src = _shifted_slices(combined.shape[0], y_step * shift)
+        cols_dst, cols_src = _shifted_slices(combined.shape[1], -x_sign * x_step * shift)
+        destination = combined[rows_dst, cols_dst]
+        source = image[rows_src, cols_src]
+        fill = (destination < 0) & (source >= 0)
+        destination[fill] = source[fill]
+
+    if verbosity >= 3:
+        print("  Stitched {:d} tiles ({:d} pixels still missing)".format(len(tiles), int(np.sum(combined < 0))))
+
+    if output_file is not None:
+        tifffile.imwrite(output_file, combined)
+        if verbosity >= 3:
+            print("  Stitched data saved as: {}".format(output_file))
+
+    return combined
+
+
+def move_motors(targets, timeout=None, tolerance=1e-4, verbosity=3):
+    """Move all the motors ({motor: position}) at the same time, and wait
+    until they have all finished moving."""
+
+    statuses = []
+    for motor, position in targets.items():
+        if abs(motor.user_readback.value - position) > tolerance:
+            if verbosity >= 4:
+                print("  Moving {} to {:.3f}".format(motor.name, position))
+            statuses.append((motor, motor.set(position)))
+
+    for motor, status in statuses:
+        try:
+            status.wait(timeout=timeout)
+        except Exception as e:
+            if verbosity >= 1:
+                print("WARNING: {} did not finish moving: {}".format(motor.name, e))
+
+
+def cached_attributes(method):
+    """Decorator for Sample measurement methods: attributes used in the savename
+    (and the savename itself) are only computed once during the call. See
+    Sample_Generic.attribute_cache."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.attribute_cache():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class Sample_Generic(CoordinateSystem):
     """
     The Sample() classes are used to define a single, individual sample. Each
@@ -1392,6 +1686,9 @@ class Sample_Generic(CoordinateSystem):
         self.naming_scheme = ["name", "extra", "exposure_time", "id"]
         self.naming_delimeter = "_"
 
+        # Most recent (raw file, link) for each detector, set by handle_file
+        self.last_files = {}
+
         # TODO
         # if base is not None:
         # base.addSample(self)
@@ -1479,90 +1776,100 @@ class Sample_Generic(CoordinateSystem):
 
         return self.clock()
 
-    def get_attribute(self, attribute):
-        """Return the value of the requested md."""
-
-        if attribute in self._axes:
-            return self._axes[attribute].get_position(verbosity=0)
+    # Attributes that are computed (rather than stored in self.md). Entries in
+    # _attribute_getters take precedence over self.md; entries in
+    # _attribute_getters_fallback are only used if the attribute is not in self.md.
+    _attribute_getters = {
+        "name": lambda self: self.name,
+        "clock": lambda self: self.clock(),
+        "temperature": lambda self: self.temperature(verbosity=0),
+        "temperature_A": lambda self: self.temperature(temperature_probe="A", verbosity=0),
+        "temperature_B": lambda self: self.temperature(temperature_probe="B", verbosity=0),
+        "temperature_C": lambda self: self.temperature(temperature_probe="C", verbosity=0),
+        "temperature_D": lambda self: self.temperature(temperature_probe="D", verbosity=0),
+        "temperature_E": lambda self: self.temperature(temperature_probe="E", verbosity=0),
+        "humidity": lambda self: self.humidity(verbosity=0, AI_chan=7),
+        "WAXSy": lambda self: WAXSy.position,
+        "WAXSx": lambda self: WAXSx.position,
+        "SAXSy": lambda self: SAXSy.position,
+        "SAXSx": lambda self: SAXSx.position,
+        # 'temperature_Linkam': lambda self: LThermal.temperature(),
+    }
 
-        if attribute == "name":
-            return self.name
+    def _flow_string(self):
+        if MFC.mode("A1") == 0:  # open
+            return "flowMAX"
+        if MFC.mode("A1") == 1:  # close
+            return "flowOFF"
+        if MFC.mode("A1") == 2:
+            return "flow{}".format(MFC.flow("A1"))
+
+    _attribute_getters_fallback = {
+        "energy": lambda self: "{}kev".format(np.round(beam.energy(verbosity=0), 2)),
+        "dry": lambda self: "dry{}".format(readDryFlow()),
+        "wet": lambda self: "wet{}".format(readWetFlow()),
+        "flow": _flow_string,
+        "voltage": lambda self: "{0:.3f}V".format(ioL.read(AI[1])),
+        "applied_v": lambda self: "{0:.3f}V".format(ioL.read(AO[5])),
+        # temporary for B. Wild run 10/16/19
+        "TC": lambda self: "{0:.3f}C".format(1.0175 * ioL.read(TC[1]) - 4.1286),
+        "pos1": lambda self: "pos1",
+        "pos2": lambda self: "pos2",
+        "pos3": lambda self: "pos3",
+        "pos4": lambda self: "pos4",
+    }
+    _attribute_getters_fallback.update(
+        {"voltage{}".format(ii): (lambda self, ii=ii: "{0:.3f}V".format(ioL.read(AI[ii]))) for ii in range(9)}
+    )
+
+    _attribute_replacements = {
+        "id": "measurement_ID",
+        "ID": "measurement_ID",
+        "extra": "savename_extra",
+    }
 
-        if attribute == "clock":
-            return self.clock()
+    @contextmanager
+    def attribute_cache(self):
+        """Within this block, computed attributes (positions, temperatures, etc.)
+        are only evaluated once, and savenames are only built once per 'extra'.
+        Used for the duration of a single measurement. Blocks can be nested."""
 
-        if attribute == "temperature":
-            return self.temperature(verbosity=0)
-        if attribute == "temperature_A":
-            return self.temperature(temperature_probe="A", verbosity=0)
-        if attribute == "temperature_B":
-            return self.temperature(temperature_probe="B", verbosity=0)
-        if attribute == "temperature_C":
-            return self.temperature(temperature_probe="C", verbosity=0)
-        if attribute == "temperature_D":
-            return self.temperature(temperature_probe="D", verbosity=0)
-        if attribute == "temperature_E":
-            return self.temperature(temperature_probe="E", verbosity=0)
-        if attribute == "humidity":
-            return self.humidity(verbosity=0, AI_chan=7)
+        if getattr(self, "_attribute_cache", None) is not None:
+            yield
+            return
 
-        if attribute == "WAXSy":
-            return WAXSy.position
-        if attribute == "WAXSx":
-            return WAXSx.position
+        self._attribute_cache = {}
+        self._savename_cache = {}
+        try:
+            yield
+        finally:
+            self._attribute_cache = None
+            self._savename_cache = None
 
-        if attribute == "SAXSy":
-            return SAXSy.position
-        if attribute == "SAXSx":
-            return SAXSx.position
-        # if attribute=='temperature_Linkam':
-        #     # return caget('XF:11BM-ES:{LINKAM}:TEMP')
-        #     return LThermal.temperature()
-        if attribute in self.md:
-            return self.md[attribute]
-        if attribute == "energy":
-            return "{}kev".format(np.round(beam.energy(verbosity=0), 2))
-        if attribute == "dry":
-            return "dry{}".format(readDryFlow())
-        if attribute == "wet":
-            return "wet{}".format(readWetFlow())
-        if attribute == "flow":
-            if MFC.mode("A1") == 0:  # open
-                return "flowMAX"
-            if MFC.mode("A1") == 1:  # close
-                return "flowOFF"
-            if MFC.mode("A1") == 2:
-                return "flow{}".format(MFC.flow("A1"))
-        if attribute == "voltage":
-            return "{0:.3f}V".format(ioL.read(AI[1]))
-        for ii in range(9):
-            if attribute == "voltage{}".format(ii):
-                return "{0:.3f}V".format(ioL.read(AI[ii]))
-        if attribute == "applied_v":
-            return "{0:.3f}V".format(ioL.read(AO[5]))
-        if attribute == "TC":
-            temp = 1.0175 * ioL.read(TC[1]) - 4.1286  # temporary for B. Wild run 10/16/19
-            return "{0:.3f}C".format(temp)
-
-        replacements = {
-            "id": "measurement_ID",
-            "ID": "measurement_ID",
-            "extra": "savename_extra",
-        }
+    def get_attribute(self, attribute):
+        """Return the value of the requested md."""
 
-        if attribute == "pos1":
-            return "pos1"
-        if attribute == "pos2":
-            return "pos2"
-        if attribute == "pos3":
-            return "pos3"
-        if attribute == "pos4":
-            return "pos4"
+        cache = getattr(self, "_attribute_cache", None)
+        if cache is not None and attribute in cache:
+            return cache[attribute]
 
-        if attribute in replacements:
-            return self.md[replacements[attribute]]
+        if attribute in self._axes:
+            value = self._axes[attribute].get_position(verbosity=0)
+        elif attribute in self._attribute_getters:
+            value = self._attribute_getters[attribute](self)
+        elif attribute in self.md:
+            # Stored values are not cached, since they can be changed with set_attribute
+            return self.md[attribute]
+        elif attribute in self._attribute_getters_fallback:
+            value = self._attribute_getters_fallback[attribute](self)
+        elif attribute in self._attribute_replacements:
+            return self.md[self._attribute_replacements[attribute]]
+        else:
+            return None
 
-        return None
+        if cache is not None:
+            cache[attribute] = value
+        return value
 
     def set_attribute(self, attribute, value):
         """Arbitrary attributes can be set and retrieved. You can use this to
@@ -1573,6 +1880,10 @@ class Sample_Generic(CoordinateSystem):
         """
 
         self.md[attribute] = value
+        if getattr(self, "_attribute_cache", None) is not None and attribute != "savename_extra":
+            # (cached savenames are already keyed by savename_extra)
+            self._attribute_cache.pop(attribute, None)
+            self._savename_cache.clear()
 
     def set_md(self, **md):
         self.md.update(md)
@@ -1595,11 +1906,12 @@ class Sample_Generic(CoordinateSystem):
 
         # Add md that varies over time
         md_return["clock"] = self.clock()
-        md_return["temperature"] = self.temperature(temperature_probe="A", verbosity=0)
-        md_return["temperature_A"] = self.temperature(temperature_probe="A", verbosity=0)
-        md_return["temperature_B"] = self.temperature(temperature_probe="B", verbosity=0)
-        md_return["temperature_C"] = self.temperature(temperature_probe="C", verbosity=0)
-        md_return["temperature_D"] = self.temperature(temperature_probe="D", verbosity=0)
+        with pv_snapshot.batch():
+            md_return["temperature"] = self.temperature(temperature_probe="A", verbosity=0)
+            md_return["temperature_A"] = self.temperature(temperature_probe="A", verbosity=0)
+            md_return["temperature_B"] = self.temperature(temperature_probe="B", verbosity=0)
+            md_return["temperature_C"] = self.temperature(temperature_probe="C", verbosity=0)
+            md_return["temperature_D"] = self.temperature(temperature_probe="D", verbosity=0)
         # md_return['temperature_E'] = self.temperature(temperature_probe='E', verbosity=0)
         # md_return['humidity'] = self.humidity(verbosity=0)
 
@@ -1713,6 +2025,10 @@ class Sample_Generic(CoordinateSystem):
         measurement. The method "naming" lets one control what gets stored in
         the filename."""
 
+        savename_cache = getattr(self, "_savename_cache", None)
+        if savename_cache is not None and savename_extra in savename_cache:
+            return savename_cache[savename_extra]
+
         if savename_extra is not None:
             self.set_attribute("savename_extra", savename_extra)
 
@@ -1731,6 +2047,10 @@ class Sample_Generic(CoordinateSystem):
         # savename = savename.replace('.', 'p')
         savename = savename.replace("/", "-slash-")
 
+        savename_cache = getattr(self, "_savename_cache", None)
+        if savename_cache is not None:
+            savename_cache[savename_extra] = savename
+
         return savename
 
     # Logging methods
@@ -1845,6 +2165,7 @@ class Sample_Generic(CoordinateSystem):
 
         get_beamline().beam.off()
 
+    @exposure_profiler.timed("expose")
     def expose(self, exposure_time=None, extra=None, handlefile=True, verbosity=3, poling_period=0.1, **md):
         """Internal function that is called to actually trigger a measurement."""
         """TODO: **md doesnot work in RE(count). """
@@ -1853,32 +2174,42 @@ class Sample_Generic(CoordinateSystem):
             md["measure_type"] = "expose"
         # self.log('{} for {}.'.format(md['measure_type'], self.name), **md)
 
+        # Time spent in each phase of the exposure (reported at verbosity>=4)
+        self.expose_timing = {}
+        phase_start = time.time()
+
+        def phase_done(phase):
+            nonlocal phase_start
+            now = time.time()
+            self.expose_timing[phase] = self.expose_timing.get(phase, 0.0) + (now - phase_start)
+            exposure_profiler.record("expose.{}".format(phase), now - phase_start)
+            phase_start = now
+
         # Set exposure time
         if exposure_time is not None:
             exposure_time = abs(exposure_time)
             # for detector in gs.DETS:
-            for detector in get_beamline().detector:
-                if (
-                    exposure_time != detector.cam.acquire_time.get()
-                ):  # caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime'):
-                    RE(detector.setExposureTime(exposure_time, verbosity=verbosity))
-                # if detector.name is 'pilatus800' and exposure_time != detector.cam.acquire_time.get():  #caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime'):
-                # RE(detector.setExposureTime(exposure_time, verbosity=verbosity))
-                # if detector.name is 'pilatus300' and exposure_time != detector.cam.acquire_time.get():
-                # detector.setExposureTime(exposure_time, verbosity=verbosity)
-                ##extra wait time when changing the exposure time.
-                ##time.sleep(2)
+            detectors_to_set = [
+                detector
+                for detector in get_beamline().detector
+                if exposure_time != detector.cam.acquire_time.get()
+            ]  # caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime'):
+            if len(detectors_to_set) > 0:
+                # All detectors are set concurrently, in a single plan
+                RE(setExposureTimes(detectors_to_set, exposure_time, verbosity=verbosity))
                 #############################################
                 ##extra wait time for adjusting pilatus2M
                 ##this extra wait time has to be added. Otherwise, the exposure will be skipped when the exposure time is increased
                 ##Note by 091918
                 #############################################
                 # time.sleep(2)
-                # elif detector.name is 'PhotonicSciences_CMS':
-                # detector.setExposureTime(exposure_time, verbosity=verbosity)
+        # File/exposure PVs are (re-)read once for this exposure
+        detector_registry.reset(get_beamline().detector)
+        phase_done("setup")
 
         # Do acquisition
         get_beamline().beam.on()
+        phase_done("shutter")
 
         md["plan_header_override"] = md["measure_type"]
         start_time = time.time()
@@ -1889,63 +2220,55 @@ class Sample_Generic(CoordinateSystem):
         md["beam_int_bim5"] = beam.bim5.flux(verbosity=0)
         # md['trigger_time'] = self.clock()
         # md.update(md_current)
+        phase_done("beam intensity")
 
         # uids = RE(count(get_beamline().detector, 1), **md)
         uids = RE(count(get_beamline().detector), **md)
         # yield from (count(get_beamline().detector), **md)
-
-        # get_beamline().beam.off()
-        # print('shutter is off')
+        phase_done("acquire")
 
         # Wait for detectors to be ready
         max_exposure_time = 0.1
         for detector in get_beamline().detector:
-            if detector.name is "pilatus300":
-                current_exposure_time = detector.cam.acquire_time.get()
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-            elif detector.name is "pilatus2M":
-                current_exposure_time = detector.cam.acquire_time.get()
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-            elif detector.name is "pilatus800" or detector.name is "pilatus8002":
-                current_exposure_time = detector.cam.acquire_time.get()
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-
-            # if detector.name is 'pilatus300':
-            #     current_exposure_time = caget('XF:11BMB-ES{Det:SAXS}:cam1:AcquireTime')
-            #     max_exposure_time = max(max_exposure_time, current_exposure_time)
-            # elif detector.name is 'pilatus2M':
-            #     current_exposure_time = caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime')
-            #     max_exposure_time = max(max_exposure_time, current_exposure_time)
-            # elif detector.name is 'pilatus800':
-            #     current_exposure_time = caget('XF:11BMB-ES{Det:PIL800K}:cam1:AcquireTime')
-            #     max_exposure_time = max(max_exposure_time, current_exposure_time)
-            # elif detector.name is 'PhotonicSciences_CMS':
-            # current_exposure_time = detector.exposure_time
-            # max_exposure_time = max(max_exposure_time, current_exposure_time)
+            info = detector_registry.lookup(detector)
+            if info is not None:
+                max_exposure_time = max(max_exposure_time, info.acquire_time)
             else:
                 if verbosity >= 1:
                     print("WARNING: Didn't recognize detector '{}'.".format(detector.name))
 
-        if verbosity >= 2:
-            status = 0
-            while (status == 0) and (time.time() - start_time) < (max_exposure_time + 20):
-                percentage = 100 * (time.time() - start_time) / max_exposure_time
-                print(
-                    "Exposing {:6.2f} s  ({:3.0f}%)      \r".format((time.time() - start_time), percentage),
-                    end="",
-                )
-
-                time.sleep(poling_period)
-
-                status = 1
-                for detector in get_beamline().detector:
-                    if detector.cam.acquire.get() == 1:
-                        status *= 0
-
-            # print('counting .... percentage = {}'.format(percentage))
+        # Each detector reports ready when its 'acquire' PV drops back to 0
+        ready_status = None
+        for detector in get_beamline().detector:
+            status = SubscriptionStatus(
+                detector.cam.acquire,
+                lambda *, value, **kwargs: value == 0,
+                timeout=max_exposure_time + 20,
+            )
+            ready_status = status if ready_status is None else ready_status & status
 
-        else:
-            time.sleep(max_exposure_time)
+        percentage = 100 * (time.time() - start_time) / max_exposure_time
+        if ready_status is not None:
+            try:
+                if verbosity >= 2:
+                    while not ready_status.done:
+                        percentage = 100 * (time.time() - start_time) / max_exposure_time
+                        print(
+                            "Exposing {:6.2f} s  ({:3.0f}%)      \r".format(
+                                (time.time() - start_time), percentage
+                            ),
+                            end="",
+                        )
+                        try:
+                            ready_status.wait(timeout=poling_period)
+                        except WaitTimeoutError:
+                            pass
+                else:
+                    ready_status.wait()
+            except StatusTimeoutError:
+                if verbosity >= 1:
+                    print("WARNING: Detectors still not done acquiring.")
+        phase_done("readout")
 
         # special solution for 2022_1/TKoga2
         if verbosity >= 5:
@@ -1955,219 +2278,67 @@ class Sample_Generic(CoordinateSystem):
                 print("sth is wrong .... percentage = {} < {}%".format(percentage, pct_threshold))
                 start_time = time.time()
                 uids = RE(count(get_beamline().detector), **md)
-                # yield from (count(get_beamline().detector), **md)
-
-                # get_beamline().beam.off()
-                # print('shutter is off')
 
                 # Wait for detectors to be ready
                 max_exposure_time = 0.1
                 for detector in get_beamline().detector:
-                    if detector.name is "pilatus300":
-                        current_exposure_time = detector.cam.acquire_time.get()
-                        max_exposure_time = max(max_exposure_time, current_exposure_time)
-                    elif detector.name is "pilatus2M":
-                        current_exposure_time = detector.cam.acquire_time.get()
-                        max_exposure_time = max(max_exposure_time, current_exposure_time)
-                    elif detector.name is "pilatus800" or detector.name is "pilatus8002":
-                        current_exposure_time = detector.cam.acquire_time.get()
-                        max_exposure_time = max(max_exposure_time, current_exposure_time)
+                    info = detector_registry.lookup(detector)
+                    if info is not None:
+                        max_exposure_time = max(max_exposure_time, info.acquire_time)
 
                 percentage = 100 * (time.time() - start_time) / max_exposure_time
                 print("After re-exposing .... percentage = {} ".format(percentage))
-
-                # if detector.name is 'pilatus300':
-                #     if caget('XF:11BMB-ES{Det:SAXS}:cam1:Acquire')==1:
-                #         status *= 0
-                # elif detector.name is 'pilatus2M':
-                #     if caget('XF:11BMB-ES{Det:PIL2M}:cam1:Acquire')==1:
-                #         status *= 0
-                # elif detector.name is 'pilatus800':
-                #     if caget('XF:11BMB-ES{Det:PIL800K}:cam1:Acquire')==1:
-                #         status *= 0
-                # elif detector.name is 'PhotonicSciences_CMS':
-                # if not detector.detector_is_ready(verbosity=0):
-                # status *= 0
-
-        # if verbosity>=3 and caget('XF:11BMB-ES{Det:PIL800K}:cam1:Acquire')==1:
-        #     print('Warning: Detector pilatus300 still not done acquiring.')
-
-        # #if verbosity>=3 and caget('XF:11BMB-ES{Det:SAXS}:cam1:Acquire')==1:
-        #     #print('Warning: Detector pilatus300 still not done acquiring.')
-
-        # if verbosity>=3 and caget('XF:11BMB-ES{Det:PIL2M}:cam1:Acquire')==1:
-        #     print('Warning: Detector pilatus2M still not done acquiring.')
+            phase_done("acquire")
 
         get_beamline().beam.off()
+        phase_done("shutter")
 
-        # save the percentage information
-        # if verbosity>=5:
-        #     folder = '/nsls2/data/cms/legacy/xf11bm/data/2022_1/TKoga2/'
-        #     # filename = ''
-
-        #     current_data = {'a_sample': self.name,
-        #                     'b_exposure_time': detector.cam.acquire_time.get(),
-        #                     'c_exposure_percentage': percentage,
-        #                     'd_align_time': md['filename']
-        #                     }
-
-        #     temp_data = pds.DataFrame([current_data])
-
-        #     # INT_FILENAME='{}/data/{}.csv'.format(os.path.dirname(__file__) , 'alignment_results.csv')
-        #     INT_FILENAME='{}/data/{}.csv'.format(folder , 'exposure_info.csv')
-
-        #     if os.path.isfile(INT_FILENAME):
-        #         output_data = pds.read_csv(INT_FILENAME, index_col=0)
-        #         output_data = output_data.append(temp_data, ignore_index=True)
-        #         output_data.to_csv(INT_FILENAME)
-        #     else:
-        #         temp_data.to_csv(INT_FILENAME)
-
-        if handlefile == True:
-            for detector in get_beamline().detector:
-                self.handle_file(detector, extra=extra, verbosity=verbosity, **md)
-                # self.handle_file(detector, extra=extra, verbosity=verbosity)
-
-    def _expose_test(self, exposure_time=None, extra=None, handlefile=True, verbosity=3, poling_period=0.1, **md):
-        """Internal function that is called to actually trigger a measurement."""
-        """TODO: **md doesnot work in RE(count). """
-
-        if "measure_type" not in md:
-            md["measure_type"] = "expose"
-        # self.log('{} for {}.'.format(md['measure_type'], self.name), **md)
-
-        # Set exposure time
-        start_time = time.time()
-        print("1", time.time() - start_time)
-        if exposure_time is not None:
-            exposure_time = abs(exposure_time)
-            # for detector in gs.DETS:
-            for detector in get_beamline().detector:
-                if (
-                    exposure_time != detector.cam.acquire_time.get()
-                ):  # caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime'):
-                    RE(detector.setExposureTime(exposure_time, verbosity=verbosity))
-                # if detector.name is 'pilatus800' and exposure_time != detector.cam.acquire_time.get():  #caget('XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime'):
-                # RE(detector.setExposureTime(exposure_time, verbosity=verbosity))
-                # if detector.name is 'pilatus300' and exposure_time != detector.cam.acquire_time.get():
-                # detector.setExposureTime(exposure_time, verbosity=verbosity)
-                ##extra wait time when changing the exposure time.
-                ##time.sleep(2)
-                #############################################
-                ##extra wait time for adjusting pilatus2M
-                ##this extra wait time has to be added. Otherwise, the exposure will be skipped when the exposure time is increased
-                ##Note by 091918
-                #############################################
-                # time.sleep(2)
-                # elif detector.name is 'PhotonicSciences_CMS':
-                # detector.setExposureTime(exposure_time, verbosity=verbosity)
-        print("2", time.time() - start_time)
-
-        # Do acquisition
-        get_beamline().beam.on()
-        print("beamon", time.time() - start_time)
-
-        md["plan_header_override"] = md["measure_type"]
-        # start_time = time.time()
-
-        # md_current = self.get_md()
-        md["beam_int_bim3"] = beam.bim3.flux(verbosity=0)
-        md["beam_int_bim4"] = beam.bim4.flux(verbosity=0)
-        md["beam_int_bim5"] = beam.bim5.flux(verbosity=0)
-        # md['trigger_time'] = self.clock()
-        # md.update(md_current)
-
-        print("3", time.time() - start_time)
-        # uids = RE(count(get_beamline().detector, 1), **md)
-        uids = RE(count(get_beamline().detector), **md)
-        # yield from (count(get_beamline().detector), **md)
-        print("4", time.time() - start_time)
-
-        # get_beamline().beam.off()
-        # print('shutter is off')
-
-        # Wait for detectors to be ready
-        max_exposure_time = 0.1
-        for detector in get_beamline().detector:
-            if detector.name is "pilatus300":
-                current_exposure_time = caget("XF:11BMB-ES{Det:SAXS}:cam1:AcquireTime")
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-            elif detector.name is "pilatus2M":
-                current_exposure_time = caget("XF:11BMB-ES{Det:PIL2M}:cam1:AcquireTime")
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-            elif detector.name is "pilatus800":
-                current_exposure_time = caget("XF:11BMB-ES{Det:PIL800K}:cam1:AcquireTime")
-                max_exposure_time = max(max_exposure_time, current_exposure_time)
-            # elif detector.name is 'PhotonicSciences_CMS':
-            # current_exposure_time = detector.exposure_time
-            # max_exposure_time = max(max_exposure_time, current_exposure_time)
-            else:
-                if verbosity >= 1:
-                    print("WARNING: Didn't recognize detector '{}'.".format(detector.name))
-
-        print("5", time.time() - start_time)
-        if verbosity >= 2:
-            status = 0
-            while (status == 0) and (time.time() - start_time) < (max_exposure_time + 20):
-                percentage = 100 * (time.time() - start_time) / max_exposure_time
-                print(
-                    "Exposing {:6.2f} s  ({:3.0f}%)      \r".format((time.time() - start_time), percentage),
-                    end="",
-                )
-                time.sleep(poling_period)
-
-                status = 1
-                for detector in get_beamline().detector:
-                    if detector.name is "pilatus300":
-                        if caget("XF:11BMB-ES{Det:SAXS}:cam1:Acquire") == 1:
-                            status *= 0
-                    elif detector.name is "pilatus2M":
-                        if caget("XF:11BMB-ES{Det:PIL2M}:cam1:Acquire") == 1:
-                            status *= 0
-                    elif detector.name is "pilatus800":
-                        if caget("XF:11BMB-ES{Det:PIL800K}:cam1:Acquire") == 1:
-                            status *= 0
-                    # elif detector.name is 'PhotonicSciences_CMS':
-                    # if not detector.detector_is_ready(verbosity=0):
-                    # status *= 0
-            print("6", time.time() - start_time)
-
-        else:
-            time.sleep(max_exposure_time)
-        print("7", time.time() - start_time)
-
-        # if verbosity>=3 and caget('XF:11BMB-ES{Det:SAXS}:cam1:Acquire')==1:
-        # print('Warning: Detector pilatus300 still not done acquiring.')
+        if handlefile == True:
+            for detector in get_beamline().detector:
+                self.handle_file(detector, extra=extra, verbosity=verbosity, refresh=False, **md)
+                # self.handle_file(detector, extra=extra, verbosity=verbosity)
+            phase_done("file handling")
 
-        if verbosity >= 3 and caget("XF:11BMB-ES{Det:PIL2M}:cam1:Acquire") == 1:
-            print("Warning: Detector pilatus2M still not done acquiring.")
+        if verbosity >= 4:
+            print(
+                "  expose timing: "
+                + ", ".join("{} {:.3f} s".format(phase, dt) for phase, dt in self.expose_timing.items())
+            )
 
-        get_beamline().beam.off()
-        print("8", time.time() - start_time)
+    @exposure_profiler.timed("handle_file")
+    def handle_file(
+        self, detector, extra=None, verbosity=3, subdirs=True, linksave=True, refresh=True, background=None, **md
+    ):
+        """Link the file just written by the detector into the experiment directory.
 
-        # if handlefile == True:
-        # for detector in get_beamline().detector:
-        # self.handle_file(detector, extra=extra, verbosity=verbosity, **md)
-        ##self.handle_file(detector, extra=extra, verbosity=verbosity)
+        The detector PVs are read through detector_registry. Use refresh=False
+        to re-use the values already read for the current exposure.
 
-    def handle_file(self, detector, extra=None, verbosity=3, subdirs=True, linksave=True, **md):
-        subdir = ""
-        if subdirs:
-            if detector.name is "pilatus300" or detector.name is "pilatus8002":
-                subdir = "/maxs/raw/"
-                detname = "maxs"
-            elif detector.name is "pilatus2M":
-                subdir = "/saxs/raw/"
-                detname = "saxs"
-            elif detector.name is "pilatus800":
-                subdir = "/waxs/raw/"
-                detname = "waxs"
-            else:
-                if verbosity >= 1:
-                    print("WARNING: Can't do file handling for detector '{}'.".format(detector.name))
-                    return
+        If background is True (default: file_handler.enabled), the link is
+        made by the file_handler thread instead, so that this returns without
+        waiting for the file to appear on disk."""
+        info = detector_registry.lookup(detector, refresh=refresh)
+        if info is None:
+            if verbosity >= 1:
+                print("WARNING: Can't do file handling for detector '{}'.".format(detector.name))
+            return
+        subdir = info.subdir if subdirs else ""
+        detname = info.detname
+        if background is None:
+            background = file_handler.enabled
+
+        filename = info.full_file_name  # RL, 20210831
+        if background:
+            self.set_attribute("exposure_time", info.acquire_time)
+            link_name = "{}/{}{}_{}.tiff".format(
+                RE.md["experiment_alias_directory"], subdir, md["filename"], detname
+            )
+            file_handler.submit(detector.name, filename, link_name, verbosity=verbosity)
+            self.last_files[detector.name] = (filename, link_name)
+            if verbosity >= 3:
+                print("  Data will be linked as: {}".format(link_name))
+            return
 
-        filename = detector.tiff.full_file_name.get()  # RL, 20210831
         if not os.path.isfile(filename):
             print(f"File does not exist: {filename}")
             return 
@@ -2180,7 +2351,7 @@ class Sample_Generic(CoordinateSystem):
         # if md['measure_type'] is not 'snap':
         if True:
             # self.set_attribute('exposure_time', caget('XF:11BMB-ES{Det:SAXS}:cam1:AcquireTime'))
-            self.set_attribute("exposure_time", detector.cam.acquire_time.get())  # RL, 20210831
+            self.set_attribute("exposure_time", info.acquire_time)  # RL, 20210831
 
             # Create symlink
             # link_name = '{}/{}{}'.format(RE.md['experiment_alias_directory'], subdir, md['filename'])
@@ -2191,12 +2362,8 @@ class Sample_Generic(CoordinateSystem):
             # link_name = '{}/{}{}_{:04d}_maxs.tiff'.format(RE.md['experiment_alias_directory'], subdir, savename, RE.md['scan_id']-1)
             link_name = "{}/{}{}_{}.tiff".format(RE.md["experiment_alias_directory"], subdir, savename, detname)
 
-            if os.path.isfile(link_name):
-                i = 1
-                while os.path.isfile("{}.{:d}".format(link_name, i)):
-                    i += 1
-                os.rename(link_name, "{}.{:d}".format(link_name, i))
-            os.symlink(filename, link_name)
+            link_file(filename, link_name)
+            self.last_files[detector.name] = (filename, link_name)
 
 
             #debug the losing data issue on pil2m. suggested by T. Caswell
@@ -2382,238 +2549,61 @@ class Sample_Generic(CoordinateSystem):
         )
         # remove_last_Pilatus_series()
 
-    def _measure(
+    def measure_tiled(
         self,
+        tiling,
+        angles=None,
         exposure_time=None,
         extra=None,
         measure_type="measure",
         verbosity=3,
-        tiling=False,
-        stitchback=False,
+        timeout=60,
+        stitch=True,
+        detector_positions=None,
         **md,
     ):
-        """Measure data by triggering the area detectors.
+        """Measure with detector tiling, optionally at several incident angles.
+
+        The sequence of measurements comes from plan_tiling. All detector
+        stages (and theta) move in parallel, and each measurement starts as
+        soon as the motion is complete. The detectors are moved back to their
+        original positions at the end.
 
         Parameters
         ----------
-        exposure_time : float
-            How long to collect data
-        extra : string, optional
-            Extra information about this particular measurement (which is typically
-            included in the savename/filename).
         tiling : string
-            Controls the detector tiling mode.
-              None : regular measurement (single detector position)
-              'ygaps' : try to cover the vertical gaps in the Pilatus detector
+            'ygaps' or 'xygaps'
+        angles : list of float, optional
+            Incident angles to measure at each tile (theta is not moved if None).
+        timeout : float
+            Maximum time (in seconds) to wait for each move.
+        stitch : bool
+            Combine the tiles into a gap-free image (see stitch_tiles) as soon
+            as the last tile of each angle is measured.
+        detector_positions : dict, optional
+            Labels {tile: detector_position} recorded in the metadata instead
+            of the ones from TILING_POSITIONS.
         """
 
-        if tiling is "xygaps":
-            if cms.detector == [pilatus2M]:
-                SAXSy_o = SAXSy.user_readback.value
-                SAXSx_o = SAXSx.user_readback.value
-
-                extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-                md["detector_position"] = "lower_left"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                # extra x movement is needed for pilatus2M.
-
-                SAXSy.move(SAXSy.user_readback.value + 5.16)
-                extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-                md["detector_position"] = "upper_left"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                # SAXSy.move(SAXSy.user_readback.value + -5.16)
-                SAXSx.move(SAXSx.user_readback.value + 5.16)
-                extra_current = "pos4" if extra is None else "{}_pos4".format(extra)
-                md["detector_position"] = "upper_right"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                SAXSy.move(SAXSy.user_readback.value + -5.16)
-                extra_current = "pos3" if extra is None else "{}_pos3".format(extra)
-                md["detector_position"] = "lower_right"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                SAXSx.move(SAXSx.user_readback.value + -5.16)
-
-                if SAXSx.user_readback.value != SAXSx_o:
-                    SAXSx.move(SAXSx_o)
-                if SAXSy.user_readback.value != SAXSy_o:
-                    SAXSy.move(SAXSy_o)
-            if cms.detector == [pilatus800]:
-                WAXSy_o = WAXSy.user_readback.value
-                WAXSx_o = WAXSx.user_readback.value
-
-                extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-                md["detector_position"] = "lower_left"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                # extra x movement is needed for pilatus2M.
-
-                WAXSy.move(WAXSy.user_readback.value + 5.16)
-                extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-                md["detector_position"] = "upper_left"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                WAXSx.move(WAXSx.user_readback.value - 5.16)
-                extra_current = "pos4" if extra is None else "{}_pos4".format(extra)
-                md["detector_position"] = "upper_right"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                WAXSy.move(WAXSy.user_readback.value + -5.16)
-                extra_current = "pos3" if extra is None else "{}_pos3".format(extra)
-                md["detector_position"] = "lower_right"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                WAXSx.move(WAXSx.user_readback.value + 5.16)
-
-                if WAXSx.user_readback.value != WAXSx_o:
-                    WAXSx.move(WAXSx_o)
-                if WAXSy.user_readback.value != WAXSy_o:
-                    WAXSy.move(WAXSy_o)
-
-        elif tiling is "ygaps":
-            if cms.detector == [pilatus2M]:
-                SAXSy_o = SAXSy.user_readback.value
-                SAXSx_o = SAXSx.user_readback.value
-
-                extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-                md["detector_position"] = "lower"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                # extra x movement is needed for pilatus2M.
-
-                extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-                md["detector_position"] = "upper"
-                SAXSy.move(SAXSy.user_readback.value + 5.16)
-                time.sleep(5)
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                SAXSy.move(SAXSy.user_readback.value - 5.16)
-                time.sleep(5)
-                if SAXSx.user_readback.value != SAXSx_o:
-                    SAXSx.move(SAXSx_o)
-                if SAXSy.user_readback.value != SAXSy_o:
-                    SAXSy.move(SAXSy_o)
-
-            if cms.detector == [pilatus300]:
-                # MAXSy_o = MAXSy.user_readback.value
-
-                extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-                md["detector_position"] = "lower"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                MAXSy.move(MAXSy.user_readback.value + 5.16)
-                extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-                md["detector_position"] = "upper"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                MAXSy.move(MAXSy.user_readback.value + -5.16)
-
-                # if MAXSy.user_readback.value != MAXSy_o:
-                # MAXSy.move(MAXSy_o)
-
-            if cms.detector == [pilatus800]:
-                WAXSy_o = WAXSy.user_readback.value
-
-                extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-                md["detector_position"] = "lower"
-                self.measure_single(
-                    exposure_time=exposure_time,
-                    extra=extra_current,
-                    measure_type=measure_type,
-                    verbosity=verbosity,
-                    stitchback=True,
-                    **md,
-                )
-
-                WAXSy.move(WAXSy.user_readback.value + 5.16)
-                extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-                md["detector_position"] = "upper"
+        steps, origins = plan_tiling(get_beamline().detector, tiling, angles=angles)
+        num_tiles = len(TILING_POSITIONS[tiling])
+        steps_of_tile = {tile: xy_step for tile, detector_position, xy_step in TILING_POSITIONS[tiling]}
+        tile_files = {}  # angle --> {detector name: [(raw file, link, tile), ...]}
+
+        if angles is not None:
+            th_axis = self._axes["th"]
+            th_motor = th_axis._search_motor()
+
+        try:
+            for step in steps:
+                targets = dict(step["targets"])
+                if step["angle"] is not None:
+                    targets[th_motor] = th_axis.cur_to_motor(step["angle"])
+                move_motors(targets, timeout=timeout, verbosity=verbosity)
+
+                extra_current = step["tile"] if extra is None else "{}_{}".format(extra, step["tile"])
+                md["detector_position"] = (detector_positions or {}).get(step["tile"], step["detector_position"])
+                self.last_files = {}
                 self.measure_single(
                     exposure_time=exposure_time,
                     extra=extra_current,
@@ -2623,26 +2613,55 @@ class Sample_Generic(CoordinateSystem):
                     **md,
                 )
 
-                WAXSy.move(WAXSy.user_readback.value - 5.16)
-
-                # if WAXSy.user_readback.value != WAXSy_o:
-                # WAXSy.move(MAXSy_o)
-        # if tiling is 'big':
-        # TODO: Use multiple images to fill the entire detector motion range
+                if stitch:
+                    files = tile_files.setdefault(step["angle"], {})
+                    for detector_name, (filename, link_name) in self.last_files.items():
+                        files.setdefault(detector_name, []).append((filename, link_name, step["tile"]))
+                        if len(files[detector_name]) == num_tiles:
+                            self._stitch_tiles(
+                                detector_name, files.pop(detector_name), steps_of_tile, verbosity=verbosity
+                            )
 
-        else:
-            # Just do a normal measurement
-            self.measure_single(
-                exposure_time=exposure_time, extra=extra, measure_type=measure_type, verbosity=verbosity, **md
+        finally:
+            move_motors(origins, timeout=timeout, verbosity=verbosity)
+
+    def _stitch_tiles(self, detector_name, files, steps_of_tile, verbosity=3):
+        """Stitch the tiles [(raw file, link, tile name), ...] of one detector,
+        and save the result next to the link of the first tile."""
+
+        if file_handler.enabled:
+            # The files are being linked in the background; make sure they exist
+            file_handler.flush(verbosity=verbosity)
+
+        filename, link_name, tile = files[0]
+        head, tail = os.path.split(link_name)
+        i = tail.rfind(tile)
+        output_file = os.path.join(head, tail[:i] + "stitched" + tail[i + len(tile) :]) if i >= 0 else None
+        if output_file is None:
+            output_file = "{}_stitched.tiff".format(os.path.splitext(link_name)[0])
+
+        info = detector_registry.entries.get(detector_name)
+        pixel_size = info.pixel_size if info is not None else 0.172
+        x_sign = info.tile_x_sign if info is not None else +1
+        try:
+            stitch_tiles(
+                [(filename, steps_of_tile[tile]) for filename, link_name, tile in files],
+                output_file=output_file,
+                pixel_size=pixel_size,
+                x_sign=x_sign,
+                verbosity=verbosity,
             )
+        except Exception as e:
+            if verbosity >= 1:
+                print("WARNING: Could not stitch tiles for {}: {}".format(detector_name, e))
 
-    def measure(
+    def _measure(
         self,
         exposure_time=None,
         extra=None,
         measure_type="measure",
         verbosity=3,
-        tiling=None,
+        tiling=False,
         stitchback=False,
         **md,
     ):
@@ -2659,121 +2678,63 @@ class Sample_Generic(CoordinateSystem):
             Controls the detector tiling mode.
               None : regular measurement (single detector position)
               'ygaps' : try to cover the vertical gaps in the Pilatus detector
+              'xygaps' : cover both the vertical and horizontal gaps (4 tiles)
+            See measure_tiled.
         """
 
-        if tiling is "xygaps":
-            SAXSy_o = SAXSy.user_readback.value
-            SAXSx_o = SAXSx.user_readback.value
-            WAXSy_o = WAXSy.user_readback.value
-            WAXSx_o = WAXSx.user_readback.value
-            # MAXSy_o = MAXSy.user_readback.value
-
-            extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-            md["detector_position"] = "lower_left"
-            self.measure_single(
+        if tiling in TILING_POSITIONS:
+            self.measure_tiled(
+                tiling,
                 exposure_time=exposure_time,
-                extra=extra_current,
+                extra=extra,
                 measure_type=measure_type,
                 verbosity=verbosity,
-                stitchback=True,
                 **md,
             )
 
-            # pos2
-            if [pilatus2M] in cms.detector:
-                SAXSy.move(SAXSy_o + 5.16)
-            if [pilatus800] in cms.detector:
-                WAXSy.move(WAXSy_o + 5.16)
-            # if [pilatus300] in cms.detector:
-            # MAXSy.move(MAXSy_o + 5.16)
-
-            extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-            md["detector_position"] = "upper_left"
-            self.measure_single(
-                exposure_time=exposure_time, extra=extra_current, verbosity=verbosity, stitchback=True, **md
-            )
-
-            # pos4
-            if pilatus2M in cms.detector:
-                SAXSx.move(SAXSx_o + 5.16)
-                SAXSy.move(SAXSy.o + 5.16)
-            if pilatus800 in cms.detector:
-                WAXSx.move(WAXSx_o - 5.16)
-                WAXSy.move(WAXSy_o + 5.16)
-            extra_current = "pos4" if extra is None else "{}_pos4".format(extra)
-            md["detector_position"] = "upper_right"
-            self.measure_single(
-                exposure_time=exposure_time, extra=extra_current, verbosity=verbosity, stitchback=True, **md
-            )
-
-            # pos3
-            if pilatus2M in cms.detector:
-                SAXSx.move(SAXSx_o + 5.16)
-                SAXSy.move(SAXSy_o)
-            if pilatus800 in cms.detector:
-                WAXSx.move(WAXSx_o - 5.16)
-                WAXSy.move(WAXSy_o)
-
-            extra_current = "pos3" if extra is None else "{}_pos3".format(extra)
-            md["detector_position"] = "lower_right"
+        else:
+            # Just do a normal measurement
             self.measure_single(
-                exposure_time=exposure_time, extra=extra_current, verbosity=verbosity, stitchback=True, **md
+                exposure_time=exposure_time, extra=extra, measure_type=measure_type, verbosity=verbosity, **md
             )
 
-            if WAXSx.user_readback.value != WAXSx_o:
-                WAXSx.move(WAXSx_o)
-            if WAXSy.user_readback.value != WAXSy_o:
-                WAXSy.move(WAXSy_o)
-
-            if SAXSx.user_readback.value != SAXSx_o:
-                SAXSx.move(SAXSx_o)
-            if SAXSy.user_readback.value != SAXSy_o:
-                SAXSy.move(SAXSy_o)
-
-        elif tiling is "ygaps":
-            SAXSy_o = SAXSy.user_readback.value
-            SAXSx_o = SAXSx.user_readback.value
-            WAXSy_o = WAXSy.user_readback.value
-            WAXSx_o = WAXSx.user_readback.value
-            ##MAXSy_o = MAXSy.user_readback.value
-
-            extra_current = "pos1" if extra is None else "{}_pos1".format(extra)
-            md["detector_position"] = "lower"
-            self.measure_single(
-                exposure_time=exposure_time,
-                extra=extra_current,
-                measure_type=measure_type,
-                verbosity=verbosity,
-                stitchback=True,
-                **md,
-            )
+    def measure(
+        self,
+        exposure_time=None,
+        extra=None,
+        measure_type="measure",
+        verbosity=3,
+        tiling=None,
+        stitchback=False,
+        **md,
+    ):
+        """Measure data by triggering the area detectors.
 
-            if pilatus2M in cms.detector:
-                SAXSy.move(SAXSy_o + 5.16)
-            if pilatus800 in cms.detector:
-                WAXSy.move(WAXSy_o + 5.16)
-            # if pilatus300 in cms.detector:
-            # MAXSy.move(MAXSy_o + 5.16)
+        Parameters
+        ----------
+        exposure_time : float
+            How long to collect data
+        extra : string, optional
+            Extra information about this particular measurement (which is typically
+            included in the savename/filename).
+        tiling : string
+            Controls the detector tiling mode.
+              None : regular measurement (single detector position)
+              'ygaps' : try to cover the vertical gaps in the Pilatus detector
+              'xygaps' : cover both the vertical and horizontal gaps (4 tiles)
+            See measure_tiled.
+        """
 
-            # extra x movement is needed for pilatus2M.
-            extra_current = "pos2" if extra is None else "{}_pos2".format(extra)
-            md["detector_position"] = "upper"
-            self.measure_single(
+        if tiling in TILING_POSITIONS:
+            self.measure_tiled(
+                tiling,
                 exposure_time=exposure_time,
-                extra=extra_current,
+                extra=extra,
                 measure_type=measure_type,
                 verbosity=verbosity,
-                stitchback=True,
                 **md,
             )
 
-            if SAXSy.user_readback.value != SAXSy_o:
-                SAXSy.move(SAXSy_o)
-            if WAXSy.user_readback.value != WAXSy_o:
-                WAXSy.move(WAXSy_o)
-            # if MAXSy.user_readback.value != MAXSy_o:
-            # MAXSy.move(MAXSy_o)
-
         else:
             # Just do a normal measurement
             self.measure_single(
@@ -2907,6 +2868,8 @@ class Sample_Generic(CoordinateSystem):
             # self.handle_file(detector, extra=extra, verbosity=verbosity)
         self.md["measurement_ID"] += 1
 
+    @exposure_profiler.timed("measure_single")
+    @cached_attributes
     def measure_single(self, exposure_time=None, extra=None, measure_type="measure", verbosity=3, **md):
         """Measure data by triggering the area detectors.
 
@@ -2935,8 +2898,10 @@ class Sample_Generic(CoordinateSystem):
             print("ERROR: No detectors defined in cms.detector")
             return
 
-        md_current = self.get_md()
-        md_current.update(self.get_measurement_md())
+        # All the slowly-varying PVs (temperatures, energy, ...) are read in one batch
+        with pv_snapshot.batch():
+            md_current = self.get_md()
+            md_current.update(self.get_measurement_md())
         md_current["sample_savename"] = savename
         md_current["measure_type"] = measure_type
         # md_current['filename'] = '{:s}_{:04d}.tiff'.format(savename, md_current['detector_sequence_ID'])
@@ -3340,6 +3305,7 @@ class Sample_Generic(CoordinateSystem):
                 print("    step 10: measuring")
             self.measure(self.SAXS_time)
 
+    @cached_attributes
     def scan_measure(
         self,
         motor,
@@ -3443,8 +3409,11 @@ class Sample_Generic(CoordinateSystem):
         # data collected, link uid to file name
         for detector in cms.detector:
             # print(detector.name)
-            self.handle_fileseries(detector, num_frames=num_frames, extra=extra, verbosity=verbosity, **md)
+            self.handle_fileseries(
+                detector, num_frames=num_frames, extra=extra, verbosity=verbosity, savename=savename, **md
+            )
 
+    @cached_attributes
     def series_measure(
         self,
         num_frames,
@@ -3536,7 +3505,9 @@ class Sample_Generic(CoordinateSystem):
         # data collected, link uid to file name
         for detector in cms.detector:
             print("handling the file names")
-            self.handle_fileseries(detector, num_frames=num_frames, extra=extra, verbosity=verbosity, **md)
+            self.handle_fileseries(
+                detector, num_frames=num_frames, extra=extra, verbosity=verbosity, savename=savename, **md
+            )
 
     def initialDetector(self):
         # reset the num_frame back to 1
@@ -3722,28 +3693,22 @@ class Sample_Generic(CoordinateSystem):
                 print("WARNING: Can't do file handling for detector '{}'.".format(detector.name))
                 return
 
-    def handle_fileseries(self, detector, num_frames=None, extra=None, verbosity=3, subdirs=True, **md):
-        subdir = ""
-        if subdirs:
-            if detector.name == "pilatus300" or detector.name == "pilatus8002":
-                subdir = "/maxs/raw/"
-                detname = "maxs"
-                print("{} data handling".format(detector.name))
-            elif detector.name == "pilatus2M":
-                subdir = "/saxs/raw/"
-                detname = "saxs"
-                print("pilatus2M data handling")
-            elif detector.name == "pilatus800":
-                subdir = "/waxs/raw/"
-                detname = "waxs"
-                print("pilatus800k data handling")
-            else:
-                if verbosity >= 1:
-                    print("WARNING: Can't do file handling for detector '{}'.".format(detector.name))
-                    return
+    def handle_fileseries(
+        self, detector, num_frames=None, extra=None, verbosity=3, subdirs=True, savename=None, **md
+    ):
+        """Link all the frames of a series into the experiment directory.
 
-        filename = detector.tiff.full_file_name.get()  # RL, 20210831
-        filename_part1 = "{:s}/{:s}".format(detector.tiff.file_path.get(), detector.tiff.file_name.get())
+        savename should be the one used for the measurement; if None, it is
+        computed from the current naming scheme."""
+        info = detector_registry.lookup(detector, refresh=True)
+        if info is None:
+            if verbosity >= 1:
+                print("WARNING: Can't do file handling for detector '{}'.".format(detector.name))
+            return
+        subdir = info.subdir if subdirs else ""
+        detname = info.detname
+        if verbosity >= 3:
+            print("{} data handling".format(detector.name))
 
         # Alternate method to get the last filename
         # filename = '{:s}/{:s}.tiff'.format( detector.tiff.file_path.get(), detector.tiff.file_name.get()  )
@@ -3754,12 +3719,13 @@ class Sample_Generic(CoordinateSystem):
         # if md['measure_type'] is not 'snap':
         if True:
             # self.set_attribute('exposure_time', caget('XF:11BMB-ES{Det:SAXS}:cam1:AcquireTime'))
-            self.set_attribute("exposure_time", detector.cam.acquire_time.get())  # RL, 20210831
+            self.set_attribute("exposure_time", info.acquire_time)  # RL, 20210831
             # Create symlink
             # link_name = '{}/{}{}'.format(RE.md['experiment_alias_directory'], subdir, md['filename'])
             # savename = md['filename'][:-5]
 
-            savename = self.get_savename(savename_extra=extra)
+            if savename is None:
+                savename = self.get_savename(savename_extra=extra)
             link_name = "{}/{}{}_{:06d}_{}.tiff".format(
                 RE.md["experiment_alias_directory"],
                 subdir,
@@ -3782,20 +3748,12 @@ class Sample_Generic(CoordinateSystem):
                     i += 1
                 os.rename(link_name, "{}.{:d}".format(link_name, i))
 
-            for num_frame in range(num_frames):
-                filename_new = "{}_{:06d}.tiff".format(filename_part1, num_frame)
-                if os.path.isfile(filename_new) == False:
-                    return print("File number {} does not exist.".format(num_frame))
-
-                link_name_new = "{}_{:06d}_{}.tiff".format(link_name_part1, num_frame, detname)
-                os.symlink(filename_new, link_name_new)
-                if verbosity >= 3:
-                    if num_frame == 0 or num_frame == np.max(num_frames):
-                        print("  Data {} linked as: {}".format(filename_new, link_name_new))
-            savename = self.get_savename(savename_extra=extra)
-            # savename = md['filename']
-            # link_name = '{}/{}{}_{:04d}_maxs.tiff'.format(RE.md['experiment_alias_directory'], subdir, savename, RE.md['scan_id']-1)
-            link_name = "{}/{}{}_{}.tiff".format(RE.md["experiment_alias_directory"], subdir, savename, detname)
+            link_fileseries(
+                info.file_template,
+                link_name_part1.replace("{", "{{").replace("}", "}}") + "_{:06d}_" + detname + ".tiff",
+                num_frames,
+                verbosity=verbosity,
+            )
 
     # Control methods
     ########################################
@@ -3806,7 +3764,7 @@ class Sample_Generic(CoordinateSystem):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:1}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:1}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:1}T-SP", temperature + 273.15)
@@ -3815,7 +3773,7 @@ class Sample_Generic(CoordinateSystem):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:2}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:2}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:2}T-SP", temperature + 273.15)
@@ -3824,7 +3782,7 @@ class Sample_Generic(CoordinateSystem):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:3}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:3}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:3}T-SP", temperature + 273.15)
@@ -3833,7 +3791,7 @@ class Sample_Generic(CoordinateSystem):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:4}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:4}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:4}T-SP", temperature + 273.15)
@@ -3843,7 +3801,7 @@ class Sample_Generic(CoordinateSystem):
         # print('Temperature functions not implemented in {}'.format(self.__class__.__name__))
 
         if temperature_probe == "A":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:A}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:A}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -3852,7 +3810,7 @@ class Sample_Generic(CoordinateSystem):
                     )
                 )
         if temperature_probe == "B":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:B}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:B}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -3861,7 +3819,7 @@ class Sample_Generic(CoordinateSystem):
                     )
                 )
         if temperature_probe == "C":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:C}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:C}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -3870,7 +3828,7 @@ class Sample_Generic(CoordinateSystem):
                     )
                 )
         if temperature_probe == "D":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:D}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:D}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -3959,16 +3917,16 @@ class Sample_Generic(CoordinateSystem):
         # print('Temperature functions not implemented in {}'.format(self.__class__.__name__))
 
         if output_channel == "1":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:1}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:1}T-SP")
 
         if output_channel == "2":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:2}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:2}T-SP")
 
         if output_channel == "3":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:3}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:3}T-SP")
 
         if output_channel == "4":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:4}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:4}T-SP")
 
         return setpoint_temperature
 
@@ -4332,7 +4290,7 @@ class Holder(Stage):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:1}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:1}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:1}T-SP", temperature + 273.15)
@@ -4341,7 +4299,7 @@ class Holder(Stage):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:2}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:2}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:2}T-SP", temperature + 273.15)
@@ -4350,7 +4308,7 @@ class Holder(Stage):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:3}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:3}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:3}T-SP", temperature + 273.15)
@@ -4359,7 +4317,7 @@ class Holder(Stage):
             if verbosity >= 2:
                 print(
                     "  Changing temperature setpoint from {:.3f}°C  to {:.3f}°C".format(
-                        caget("XF:11BM-ES{Env:01-Out:4}T-SP") - 273.15, temperature
+                        cacheget("XF:11BM-ES{Env:01-Out:4}T-SP") - 273.15, temperature
                     )
                 )
             caput("XF:11BM-ES{Env:01-Out:4}T-SP", temperature + 273.15)
@@ -4369,7 +4327,7 @@ class Holder(Stage):
         # print('Temperature functions not implemented in {}'.format(self.__class__.__name__))
 
         if temperature_probe == "A":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:A}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:A}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -4379,7 +4337,7 @@ class Holder(Stage):
                 )
 
         if temperature_probe == "B":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:B}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:B}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -4389,7 +4347,7 @@ class Holder(Stage):
                 )
 
         if temperature_probe == "C":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:C}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:C}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -4399,7 +4357,7 @@ class Holder(Stage):
                 )
 
         if temperature_probe == "D":
-            current_temperature = caget("XF:11BM-ES{Env:01-Chan:D}T:C-I")
+            current_temperature = pv_snapshot.get("XF:11BM-ES{Env:01-Chan:D}T:C-I")
             if verbosity >= 3:
                 print(
                     "  Temperature = {:.3f}°C (setpoint = {:.3f}°C)".format(
@@ -4415,33 +4373,57 @@ class Holder(Stage):
         # print('Temperature functions not implemented in {}'.format(self.__class__.__name__))
 
         if output_channel == "1":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:1}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:1}T-SP")
 
         if output_channel == "2":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:2}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:2}T-SP")
 
         if output_channel == "3":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:3}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:3}T-SP")
 
         if output_channel == "4":
-            setpoint_temperature = caget("XF:11BM-ES{Env:01-Out:4}T-SP")
+            setpoint_temperature = cacheget("XF:11BM-ES{Env:01-Out:4}T-SP")
 
         return setpoint_temperature
 
     # Action (measurement) methods
     ########################################
 
-    def doSamples(self, range=None, verbosity=3, **md):
+    def doSamples(self, range=None, verbosity=3, profile=False, background_files=False, **md):
         """Activate the default action (typically measurement) for all the samples.
 
         If the optional range argument is provided (2-tuple), then only sample
         numbers within that range (inclusive) are run. If range is instead a
-        string, then all samples with names that match are returned."""
+        string, then all samples with names that match are returned.
 
-        for sample in self.getSamples(range=range):
-            if verbosity >= 3:
-                print("Doing sample {}...".format(sample.name))
-            sample.do(verbosity=verbosity, **md)
+        If profile is True, the exposure timing (see exposure_profiler) is
+        reset before the run and a summary table is printed at the end. If
+        profile is a filename, the summary is also saved there as CSV.
+
+        If background_files is True, the detector files are linked by the
+        file_handler thread while the next samples are measured; the run
+        waits for all the links (and reports failures) at the end."""
+
+        if profile:
+            exposure_profiler.reset()
+
+        background_enabled = file_handler.enabled
+        if background_files:
+            file_handler.enabled = True
+        try:
+            for sample in self.getSamples(range=range):
+                if verbosity >= 3:
+                    print("Doing sample {}...".format(sample.name))
+                sample.do(verbosity=verbosity, **md)
+        finally:
+            file_handler.enabled = background_enabled
+            if background_files:
+                file_handler.flush(verbosity=verbosity)
+
+        if profile:
+            exposure_profiler.print_summary(verbosity=verbosity)
+            if isinstance(profile, str):
+                exposure_profiler.to_csv(profile, verbosity=verbosity)
 
     def doTemperature(
         self,